@@ -0,0 +1,31 @@
+"""add hnsw index on document chunk embeddings"""
+
+from alembic import op
+
+from backend.app.core.config import settings
+
+try:
+    from pgvector.sqlalchemy import Vector
+except Exception:  # noqa: BLE001
+    Vector = None
+
+# revision identifiers, used by Alembic.
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    if Vector:
+        # vector_l2_ops matches the <-> operator used by DocumentIngestionService.search
+        op.execute(
+            "CREATE INDEX IF NOT EXISTS ix_document_chunks_embedding_hnsw ON document_chunks "
+            "USING hnsw (embedding vector_l2_ops) "
+            f"WITH (m = {int(settings.hnsw_m)}, ef_construction = {int(settings.hnsw_ef_construction)})"
+        )
+
+
+def downgrade() -> None:
+    if Vector:
+        op.execute("DROP INDEX IF EXISTS ix_document_chunks_embedding_hnsw")
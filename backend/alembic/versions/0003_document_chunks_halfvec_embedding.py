@@ -0,0 +1,46 @@
+"""store document chunk embeddings as halfvec"""
+
+from alembic import op
+
+from backend.app.core.config import settings
+
+try:
+    from pgvector.sqlalchemy import HALFVEC
+except Exception:  # noqa: BLE001
+    HALFVEC = None
+
+# revision identifiers, used by Alembic.
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+# must match DocumentChunk.embedding, which is HALFVEC(settings.embedding_dim)
+DIM = int(settings.embedding_dim)
+HNSW_WITH = f"WITH (m = {int(settings.hnsw_m)}, ef_construction = {int(settings.hnsw_ef_construction)})"
+
+
+def upgrade() -> None:
+    if not HALFVEC:
+        return
+    op.execute("DROP INDEX IF EXISTS ix_document_chunks_embedding_hnsw")
+    op.execute(
+        f"ALTER TABLE document_chunks ALTER COLUMN embedding TYPE halfvec({DIM}) USING embedding::halfvec({DIM})"
+    )
+    op.execute(
+        "CREATE INDEX ix_document_chunks_embedding_hnsw ON document_chunks "
+        f"USING hnsw (embedding halfvec_l2_ops) {HNSW_WITH}"
+    )
+
+
+def downgrade() -> None:
+    if not HALFVEC:
+        return
+    op.execute("DROP INDEX IF EXISTS ix_document_chunks_embedding_hnsw")
+    op.execute(
+        f"ALTER TABLE document_chunks ALTER COLUMN embedding TYPE vector({DIM}) USING embedding::vector({DIM})"
+    )
+    op.execute(
+        "CREATE INDEX ix_document_chunks_embedding_hnsw ON document_chunks "
+        f"USING hnsw (embedding vector_l2_ops) {HNSW_WITH}"
+    )
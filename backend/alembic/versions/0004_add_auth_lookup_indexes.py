@@ -0,0 +1,20 @@
+"""add auth lookup indexes"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index("ix_users_email_lower", "users", [sa.text("lower(email)")])
+    op.create_index("ix_refresh_tokens_token_user", "refresh_tokens", ["token"], postgresql_include=["user_id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_refresh_tokens_token_user", table_name="refresh_tokens")
+    op.drop_index("ix_users_email_lower", table_name="users")
@@ -0,0 +1,47 @@
+"""index document chunk embeddings for cosine distance"""
+
+from alembic import context, op
+import sqlalchemy as sa
+
+from backend.app.core.config import configure_hnsw_params, settings
+
+try:
+    from pgvector.sqlalchemy import HALFVEC
+except Exception:  # noqa: BLE001
+    HALFVEC = None
+
+# revision identifiers, used by Alembic.
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+def hnsw_with() -> str:
+    """Build parameters for the rebuilt index, sized for the rows it is built over when auto-tuning."""
+    m, ef_construction = settings.hnsw_m, settings.hnsw_ef_construction
+    # offline (--sql) runs have no database to count
+    if settings.hnsw_auto_tune and not context.is_offline_mode():
+        vector_count = op.get_bind().execute(sa.text("SELECT count(*) FROM document_chunks")).scalar_one()
+        m, ef_construction, _ = configure_hnsw_params(vector_count)
+    return f"WITH (m = {int(m)}, ef_construction = {int(ef_construction)})"
+
+
+def upgrade() -> None:
+    if not HALFVEC:
+        return
+    op.execute("DROP INDEX IF EXISTS ix_document_chunks_embedding_hnsw")
+    op.execute(
+        "CREATE INDEX ix_document_chunks_embedding_hnsw ON document_chunks "
+        f"USING hnsw (embedding halfvec_cosine_ops) {hnsw_with()}"
+    )
+
+
+def downgrade() -> None:
+    if not HALFVEC:
+        return
+    op.execute("DROP INDEX IF EXISTS ix_document_chunks_embedding_hnsw")
+    op.execute(
+        "CREATE INDEX ix_document_chunks_embedding_hnsw ON document_chunks "
+        f"USING hnsw (embedding halfvec_l2_ops) {hnsw_with()}"
+    )
@@ -1,26 +1,74 @@
-from typing import Generator, Optional
+import hashlib
+import time
+import uuid
+from typing import AsyncGenerator, Optional
 
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from backend.app.core.config import settings
-from backend.app.core.security import decode_token
+from backend.app.core.security import decode_token_claims
 from backend.app.db import models
-from backend.app.db.session import SessionLocal, get_db
+from backend.app.db.session import get_db
+from backend.app.services.embedding import EmbeddingService, get_embedding_service
+from src.services.cache import TTLCache
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.api_prefix}/auth/login")
 
+# sha256(token) -> user id, and user id -> column snapshot of that user; together they skip JWT
+# verification and the users lookup. Snapshots are keyed by user so they can be dropped per user.
+_token_users = TTLCache(maxsize=settings.auth_cache_maxsize)
+_user_cache = TTLCache(maxsize=settings.auth_cache_maxsize)
 
-def get_db_session() -> Generator[Session, None, None]:
-    yield from get_db()
 
+def _token_key(token: str) -> bytes:
+    return hashlib.sha256(token.encode("utf-8")).digest()
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db_session)) -> Optional[models.User]:
-    email = decode_token(token)
+
+def invalidate_cached_user(user_id: uuid.UUID) -> None:
+    _user_cache.delete(user_id)
+
+
+async def get_db_session() -> AsyncGenerator[AsyncSession, None]:
+    async for db in get_db():
+        yield db
+
+
+def get_embedding() -> EmbeddingService:
+    return get_embedding_service()
+
+
+async def get_current_user(
+    token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db_session)
+) -> Optional[models.User]:
+    key = _token_key(token)
+    user_id = _token_users.get(key)
+    cached = _user_cache.get(user_id) if user_id is not None else None
+    if cached is not None:
+        # detached copy built from the snapshot; callers only read its column attributes
+        return models.User(**cached)
+
+    claims = decode_token_claims(token)
+    email = claims.get("sub") if claims else None
     if not email:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
-    user = db.query(models.User).filter(models.User.email == email).first()
+    user = await db.scalar(select(models.User).where(models.User.email == email))
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
+
+    ttl = min(settings.auth_cache_ttl_seconds, claims.get("exp", 0) - time.time())
+    _token_users.set(key, user.id, ttl)
+    _user_cache.set(
+        user.id,
+        {
+            "id": user.id,
+            "email": user.email,
+            "role": user.role,
+            "is_active": user.is_active,
+            "created_at": user.created_at,
+        },
+        ttl,
+    )
     return user
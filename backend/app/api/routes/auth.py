@@ -1,35 +1,48 @@
 from datetime import timedelta
 
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy import func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from backend.app.core import security
 from backend.app.core.config import settings
 from backend.app.db import models
 from backend.app.schemas import TokenResponse, UserCreate, UserRead
-from backend.app.api.deps import get_db_session, get_current_user
+from backend.app.api.deps import get_db_session, get_current_user, invalidate_cached_user
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
 
 @router.post("/register", response_model=UserRead)
-def register(user_in: UserCreate, db: Session = Depends(get_db_session)):
-    existing = db.query(models.User).filter(models.User.email == user_in.email).first()
+async def register(user_in: UserCreate, db: AsyncSession = Depends(get_db_session)):
+    email = user_in.email.lower()
+    existing = await db.scalar(select(models.User).where(func.lower(models.User.email) == email))
     if existing:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="User already exists")
-    user = models.User(email=user_in.email, hashed_password=security.get_password_hash(user_in.password))
-    db.add(user)
-    db.commit()
-    db.refresh(user)
+    # password hashing is CPU bound; keep it off the event loop
+    hashed_password = await run_in_threadpool(security.get_password_hash, user_in.password)
+    # RETURNING hands back server/default-populated columns without a follow-up SELECT
+    stmt = insert(models.User).values(email=email, hashed_password=hashed_password).returning(models.User)
+    user = (await db.execute(stmt)).scalar_one()
+    await db.commit()
     return user
 
 
 @router.post("/login", response_model=TokenResponse)
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db_session)):
-    user = db.query(models.User).filter(models.User.email == form_data.username).first()
-    if not user or not security.verify_password(form_data.password, user.hashed_password):
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_db_session)):
+    # lower(email) matches the ix_users_email_lower functional index and accounts created before normalisation
+    user = await db.scalar(select(models.User).where(func.lower(models.User.email) == form_data.username.lower()))
+    if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
+    verified, new_hash = await run_in_threadpool(
+        security.verify_and_update_password, form_data.password, user.hashed_password
+    )
+    if not verified:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
+    if new_hash:
+        user.hashed_password = new_hash
 
     access_token = security.create_token(
         subject=user.email, expires_delta=timedelta(minutes=settings.access_token_expire_minutes)
@@ -39,16 +52,16 @@ def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depend
     )
 
     db.add(models.RefreshToken(user_id=user.id, token=refresh_token))
-    db.commit()
+    await db.commit()
     return TokenResponse(access_token=access_token, refresh_token=refresh_token)
 
 
 @router.post("/refresh", response_model=TokenResponse)
-def refresh(token: str, db: Session = Depends(get_db_session)):
+async def refresh(token: str, db: AsyncSession = Depends(get_db_session)):
     email = security.decode_token(token)
     if not email:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token")
-    record = db.query(models.RefreshToken).filter(models.RefreshToken.token == token).first()
+    record = await db.scalar(select(models.RefreshToken).where(models.RefreshToken.token == token))
     if not record:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Refresh token not found")
 
@@ -59,10 +72,12 @@ def refresh(token: str, db: Session = Depends(get_db_session)):
         subject=email, expires_delta=timedelta(minutes=settings.refresh_token_expire_minutes)
     )
     record.token = refresh_token
-    db.commit()
+    await db.commit()
+    # the next request re-reads the user instead of serving the pre-refresh snapshot
+    invalidate_cached_user(record.user_id)
     return TokenResponse(access_token=access_token, refresh_token=refresh_token)
 
 
 @router.get("/me", response_model=UserRead)
-def me(current_user: models.User = Depends(get_current_user)):
+async def me(current_user: models.User = Depends(get_current_user)):
     return current_user
@@ -1,34 +1,52 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from functools import lru_cache
+from typing import List, Optional
 
-from backend.app.api.deps import get_current_user, get_db_session
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.app.api.deps import get_current_user, get_db_session, get_embedding
 from backend.app.core.config import settings
 from backend.app.db import models
 from backend.app.schemas import DocumentIngestResponse
 from backend.app.services.databricks import DatabricksIngestionService
 from backend.app.services.documents import DocumentIngestionService
+from backend.app.services.embedding import EmbeddingService
 
 router = APIRouter(prefix="/databricks", tags=["databricks"])
 
 
+@lru_cache(maxsize=4)
+def _get_databricks_service(
+    host: str, token: str, http_path: Optional[str], warehouse_id: Optional[str]
+) -> DatabricksIngestionService:
+    # the WorkspaceClient owns the HTTP session and auth state; reuse it instead of re-handshaking per request
+    return DatabricksIngestionService(host=host, token=token, http_path=http_path, warehouse_id=warehouse_id)
+
+
 @router.post("/ingest-table", response_model=DocumentIngestResponse)
-def ingest_table(
+async def ingest_table(
     table: str,
     limit: int = 50,
-    db: Session = Depends(get_db_session),
+    columns: Optional[List[str]] = Query(default=None),
+    db: AsyncSession = Depends(get_db_session),
+    embedding_service: EmbeddingService = Depends(get_embedding),
     current_user: models.User = Depends(get_current_user),
 ):
     if not (settings.databricks_host and settings.databricks_token):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Databricks not configured")
-    service = DatabricksIngestionService(
-        host=settings.databricks_host,
-        token=settings.databricks_token,
-        http_path=settings.databricks_http_path,
-        warehouse_id=settings.databricks_warehouse_id,
+    service = _get_databricks_service(
+        settings.databricks_host,
+        settings.databricks_token,
+        settings.databricks_http_path,
+        settings.databricks_warehouse_id,
     )
-    rows = service.fetch_table_sample(table, limit=limit)
+    try:
+        rows = await run_in_threadpool(service.fetch_table_sample, table, limit=limit, columns=columns)
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
     if not rows:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No rows returned from Databricks")
-    ingestion = DocumentIngestionService(db)
-    document = ingestion.ingest_text_rows(rows, source=table, owner_id=current_user.id)
-    return DocumentIngestResponse(document_id=document.id, chunk_count=len(document.chunks), source="databricks")
+    ingestion = DocumentIngestionService(db, embedding_service=embedding_service)
+    document, chunk_count = await ingestion.ingest_text_rows(rows, source=table, owner_id=current_user.id)
+    return DocumentIngestResponse(document_id=document.id, chunk_count=chunk_count, source="databricks")
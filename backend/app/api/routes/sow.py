@@ -1,29 +1,33 @@
 from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from backend.app.api.deps import get_current_user, get_db_session
+from backend.app.api.deps import get_current_user, get_db_session, get_embedding
 from backend.app.db import models
 from backend.app.schemas import ChunkResult, SOWRequest, SOWResponse
 from backend.app.services.documents import DocumentIngestionService
+from backend.app.services.embedding import EmbeddingService
 from backend.app.services.sow import SowService
 
 router = APIRouter(prefix="/sow", tags=["sow"])
 
 
 @router.post("/generate", response_model=SOWResponse)
-def generate_sow(
+async def generate_sow(
     request: SOWRequest,
-    db: Session = Depends(get_db_session),
+    db: AsyncSession = Depends(get_db_session),
+    embedding_service: EmbeddingService = Depends(get_embedding),
     current_user: models.User = Depends(get_current_user),
 ):
-    documents = DocumentIngestionService(db)
+    documents = DocumentIngestionService(db, embedding_service=embedding_service)
     context = []
     if request.include_retrieval and request.query:
-        context = documents.search(request.query, k=5)
+        context = await documents.search(request.query, k=5)
     snippets = [item["content"] for item in context]
 
-    service = SowService(db)
-    sow = service.generate(
+    service = SowService(db, embedding_service=embedding_service)
+    sow = await service.generate(
         project_id=request.project_id,
         title=request.title,
         requirements=request.requirements,
@@ -35,7 +39,32 @@ def generate_sow(
     return SOWResponse(sow_id=sow.id, body=sow.body, created_at=sow.created_at)
 
 
+@router.post("/generate/stream")
+async def generate_sow_stream(
+    request: SOWRequest,
+    db: AsyncSession = Depends(get_db_session),
+    embedding_service: EmbeddingService = Depends(get_embedding),
+    current_user: models.User = Depends(get_current_user),
+):
+    """Same as /generate, but streams the body as plain text while it is generated."""
+    context = []
+    if request.include_retrieval and request.query:
+        context = await DocumentIngestionService(db, embedding_service=embedding_service).search(request.query, k=5)
+
+    service = SowService(db, embedding_service=embedding_service)
+    chunks = service.stream(
+        project_id=request.project_id,
+        title=request.title,
+        requirements=request.requirements,
+        constraints=request.constraints,
+        context_snippets=[item["content"] for item in context],
+        tone=request.tone,
+        owner_id=current_user.id,
+    )
+    return StreamingResponse(chunks, media_type="text/plain; charset=utf-8")
+
+
 @router.get("/recent", response_model=list[SOWResponse])
-def list_sows(db: Session = Depends(get_db_session), current_user: models.User = Depends(get_current_user)):
-    sows = db.query(models.SOWDocument).order_by(models.SOWDocument.created_at.desc()).limit(10).all()
+async def list_sows(db: AsyncSession = Depends(get_db_session), current_user: models.User = Depends(get_current_user)):
+    sows = (await db.scalars(select(models.SOWDocument).order_by(models.SOWDocument.created_at.desc()).limit(10))).all()
     return [SOWResponse(sow_id=item.id, body=item.body, created_at=item.created_at) for item in sows]
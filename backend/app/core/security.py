@@ -1,30 +1,53 @@
-from datetime import datetime, timedelta
-from typing import Optional
+import time
+from datetime import timedelta
+from typing import Any, Dict, Optional, Tuple
 
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 
 from backend.app.core.config import settings
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# argon2id at the OWASP baseline cost; bcrypt stays verifiable and is re-hashed on the next successful login
+pwd_context = CryptContext(
+    schemes=["argon2", "bcrypt"],
+    deprecated="auto",
+    argon2__type="ID",
+    argon2__time_cost=2,
+    argon2__memory_cost=19456,
+    argon2__parallelism=1,
+)
+
+# resolved once at import; every request signs/verifies with these
+_SECRET = settings.jwt_secret_key
+_ALGORITHM = settings.jwt_algorithm
+_ALGORITHMS = [_ALGORITHM]
 
 
 def create_token(subject: str, expires_delta: timedelta) -> str:
-    to_encode = {"sub": subject, "exp": datetime.utcnow() + expires_delta}
-    return jwt.encode(to_encode, settings.jwt_secret_key, algorithm=settings.jwt_algorithm)
+    to_encode = {"sub": subject, "exp": int(time.time() + expires_delta.total_seconds())}
+    return jwt.encode(to_encode, _SECRET, algorithm=_ALGORITHM)
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 
+def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """Verify a password and return a replacement hash when the stored one uses a deprecated scheme."""
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
-def decode_token(token: str) -> Optional[str]:
+def decode_token_claims(token: str) -> Optional[Dict[str, Any]]:
     try:
-        payload = jwt.decode(token, settings.jwt_secret_key, algorithms=[settings.jwt_algorithm])
-        return payload.get("sub")
+        return jwt.decode(token, _SECRET, algorithms=_ALGORITHMS)
     except JWTError:
         return None
+
+
+def decode_token(token: str) -> Optional[str]:
+    payload = decode_token_claims(token)
+    return payload.get("sub") if payload else None
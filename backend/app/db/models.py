@@ -10,9 +10,9 @@ from backend.app.core.config import settings
 from backend.app.db.session import Base
 
 try:
-    from pgvector.sqlalchemy import Vector
+    from pgvector.sqlalchemy import HALFVEC
 except Exception:  # noqa: BLE001
-    Vector = None
+    HALFVEC = None
 
 
 class User(Base):
@@ -62,7 +62,7 @@ class DocumentChunk(Base):
     content: Mapped[str] = mapped_column(Text, nullable=False)
     metadata: Mapped[Dict[str, Any]] = mapped_column(JSON, default=dict)
     embedding: Mapped[Optional[list[float]]] = mapped_column(
-        Vector(settings.embedding_dim) if settings.use_pgvector and Vector else JSON, nullable=True
+        HALFVEC(settings.embedding_dim) if settings.use_pgvector and HALFVEC else JSON, nullable=True
     )
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
 
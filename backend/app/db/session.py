@@ -1,21 +1,59 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import DeclarativeBase, sessionmaker
+from typing import Any, AsyncGenerator, Dict
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy.pool import NullPool
 
 from backend.app.core.config import settings
 
 
-connect_args = {"check_same_thread": False} if str(settings.database_url).startswith("sqlite") else {}
-engine = create_engine(settings.database_url, connect_args=connect_args)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+def async_database_url(url: str) -> str:
+    """Map the configured (sync) URL onto an asyncio-capable driver; psycopg 3 supports both modes."""
+    if url.startswith("sqlite://"):
+        return url.replace("sqlite://", "sqlite+aiosqlite://", 1)
+    if url.startswith("postgresql://"):
+        return url.replace("postgresql://", "postgresql+psycopg://", 1)
+    return url
+
+
+def engine_options() -> Dict[str, Any]:
+    if str(settings.database_url).startswith("sqlite"):
+        return {"connect_args": {"check_same_thread": False}}
+    options: Dict[str, Any] = {"pool_pre_ping": True}
+    if settings.db_statement_timeout_ms:
+        # 0 disables it, e.g. for pgbouncer setups that reject the `options` startup parameter
+        options["connect_args"] = {"options": f"-c statement_timeout={int(settings.db_statement_timeout_ms)}"}
+    if settings.db_use_null_pool:
+        options["poolclass"] = NullPool
+    else:
+        options.update(
+            pool_size=settings.db_pool_size,
+            max_overflow=settings.db_max_overflow,
+            pool_recycle=settings.db_pool_recycle_seconds,
+        )
+    return options
+
+
+engine = create_async_engine(async_database_url(str(settings.database_url)), **engine_options())
+SessionLocal = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+
+
+if settings.use_pgvector:
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def set_hnsw_ef_search(dbapi_connection, connection_record):  # noqa: ARG001
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"SET hnsw.ef_search = {int(settings.hnsw_ef_search)}")
+        cursor.close()
+        # commit so the pool's reset-on-return rollback does not revert the SET
+        dbapi_connection.commit()
 
 
 class Base(DeclarativeBase):
     pass
 
 
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db() -> AsyncGenerator[AsyncSession, None]:
+    async with SessionLocal() as db:
         yield db
-    finally:
-        db.close()
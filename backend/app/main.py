@@ -1,16 +1,47 @@
 import logging
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
 
 from backend.app.api.routes import auth, databricks, documents, sow
-from backend.app.core.config import settings
+from backend.app.core.config import configure_hnsw_params, settings
 from backend.app.db.session import Base, engine
 
 logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+async def tune_hnsw_params() -> None:
+    """Pick the HNSW search breadth from the current corpus size.
+
+    Build parameters (m, ef_construction) only matter when the index is created, so migration 0005
+    sizes those; only ef_search can change at runtime.
+    """
+    if not (settings.use_pgvector and settings.hnsw_auto_tune):
+        return
+    try:
+        async with engine.connect() as conn:
+            vector_count = (await conn.execute(text("SELECT count(*) FROM document_chunks"))).scalar_one()
+    except SQLAlchemyError as exc:
+        logger.warning("Skipping HNSW auto-tune: %s", exc)
+        return
+    *_, settings.hnsw_ef_search = configure_hnsw_params(vector_count)
+    logger.info("HNSW tuned for %s vectors: ef_search=%s", vector_count, settings.hnsw_ef_search)
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    if settings.auto_create_schema:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+    await tune_hnsw_params()
+    yield
 
-Base.metadata.create_all(bind=engine)
 
-app = FastAPI(title=settings.project_name, openapi_url=f"{settings.api_prefix}/openapi.json")
+app = FastAPI(title=settings.project_name, openapi_url=f"{settings.api_prefix}/openapi.json", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -22,7 +53,7 @@ app.add_middleware(
 
 
 @app.get("/health")
-def health():
+def health() -> dict[str, str]:
     return {"status": "ok"}
 
 
@@ -2,7 +2,7 @@ from datetime import datetime
 from typing import Any, Dict, List, Optional
 from uuid import UUID
 
-from pydantic import BaseModel, EmailStr, Field
+from pydantic import BaseModel, ConfigDict, EmailStr, Field
 
 
 class TokenResponse(BaseModel):
@@ -17,14 +17,13 @@ class UserCreate(BaseModel):
 
 
 class UserRead(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
     id: UUID
     email: EmailStr
     role: str
     created_at: datetime
 
-    class Config:
-        from_attributes = True
-
 
 class DocumentIngestResponse(BaseModel):
     document_id: UUID
@@ -38,6 +37,8 @@ class QueryRequest(BaseModel):
 
 
 class ChunkResult(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
     id: UUID
     content: str
     score: float
@@ -55,6 +56,8 @@ class SOWRequest(BaseModel):
 
 
 class SOWResponse(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
     sow_id: UUID
     body: str
     created_at: datetime
@@ -1,6 +1,15 @@
-from typing import Dict, Iterable, List
+import base64
+import re
+from typing import Dict, Iterable, List, Optional, Sequence
 
 from databricks.sdk import WorkspaceClient
+from databricks.sdk.service.sql import StatementParameterListItem
+
+# catalog.schema.table (each part a plain identifier)
+_TABLE_RE = re.compile(r"[A-Za-z_]\w*(\.[A-Za-z_]\w*){0,2}")
+_COLUMN_RE = re.compile(r"[A-Za-z_]\w*")
+# the DBFS read API rejects lengths above 1 MB
+DBFS_READ_CHUNK_SIZE = 1 << 20
 
 
 class DatabricksIngestionService:
@@ -9,27 +18,47 @@ class DatabricksIngestionService:
         self.http_path = http_path
         self.warehouse_id = warehouse_id
 
-    def fetch_table_sample(self, table: str, limit: int = 50) -> List[Dict[str, str]]:
+    def fetch_table_sample(
+        self, table: str, limit: int = 50, columns: Optional[Sequence[str]] = None
+    ) -> List[Dict[str, str]]:
         """Fetch a sample of rows from a Unity Catalog table or SQL warehouse."""
-        statement = f"SELECT * FROM {table} LIMIT {limit}"
+        if not _TABLE_RE.fullmatch(table):
+            raise ValueError(f"Invalid table name: {table}")
+        invalid = [column for column in columns or [] if not _COLUMN_RE.fullmatch(column)]
+        if invalid:
+            raise ValueError(f"Invalid column names: {', '.join(invalid)}")
+
+        # identifiers cannot be bound as values; IDENTIFIER() binds the validated table name safely
+        projection = ", ".join(f"`{column}`" for column in columns) if columns else "*"
         result = self.client.statement_execution.execute_statement(
-            statement=statement,
+            statement=f"SELECT {projection} FROM IDENTIFIER(:table) LIMIT :limit",
             warehouse_id=self.warehouse_id,
-            wait_timeout=60,
+            parameters=[
+                StatementParameterListItem(name="table", value=table, type="STRING"),
+                StatementParameterListItem(name="limit", value=str(int(limit)), type="INT"),
+            ],
+            wait_timeout="50s",
         )
-        rows: List[Dict[str, str]] = []
-        if not result.result or not result.result.data_array:
-            return rows
-        for row in result.result.data_array:
-            as_dict = {}
-            for idx, col in enumerate(result.result.manifest.columns):
-                as_dict[col.name] = str(row[idx])
-            rows.append(as_dict)
-        return rows
+        if not result.result or not result.result.data_array or not result.manifest:
+            return []
+        names = [col.name for col in result.manifest.schema.columns]
+        return [dict(zip(names, map(str, row))) for row in result.result.data_array]
 
     def fetch_dbfs_file(self, path: str) -> Iterable[Dict[str, str]]:
-        """Stream lines from a DBFS file path."""
-        content = self.client.dbfs.read(path)
-        decoded = content.data.decode("utf-8")
-        for idx, line in enumerate(decoded.splitlines()):
-            yield {"line": str(idx + 1), "content": line}
+        """Stream lines from a DBFS file path, holding at most one read chunk in memory."""
+        offset = 0
+        line_number = 0
+        pending = b""
+        while True:
+            response = self.client.dbfs.read(path, offset=offset, length=DBFS_READ_CHUNK_SIZE)
+            data = base64.b64decode(response.data or "")
+            if not data:
+                break
+            offset += len(data)
+            # split on bytes so multi-byte characters spanning a chunk boundary decode intact
+            *lines, pending = (pending + data).split(b"\n")
+            for line in lines:
+                line_number += 1
+                yield {"line": str(line_number), "content": line.rstrip(b"\r").decode("utf-8")}
+        if pending:
+            yield {"line": str(line_number + 1), "content": pending.rstrip(b"\r").decode("utf-8")}
@@ -1,90 +1,157 @@
+import shutil
 import tempfile
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, Iterable, List, Optional
+from typing import BinaryIO, Dict, Iterable, List, Optional, Tuple
 from uuid import UUID
 
-from sqlalchemy import select
-from sqlalchemy.orm import Session
+import numpy as np
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import insert, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from backend.app.core.config import settings
 from backend.app.db import models
-from backend.app.services.embedding import EmbeddingService
+from backend.app.services.embedding import EmbeddingService, get_embedding_service
+from src.services.cache import SemanticCache
 from src.services.document_service import DocumentProcessor
+from src.services.vectors import unit_rows
+
+UPLOAD_COPY_BUFFER_SIZE = 1 << 16
+
+# query -> (k, results); cleared when this process commits new chunks, while other workers and
+# instances may serve results up to search_cache_ttl_seconds old
+_search_cache = SemanticCache(
+    maxsize=settings.semantic_cache_maxsize,
+    ttl_seconds=settings.search_cache_ttl_seconds,
+    threshold=settings.semantic_cache_threshold,
+)
+
+
+@lru_cache(maxsize=1)
+def get_document_processor() -> DocumentProcessor:
+    # local parsing/chunking only, so a single unconfigured processor is shared
+    return DocumentProcessor(databricks_host=None, token=None)
 
 
 class DocumentIngestionService:
-    def __init__(self, db: Session, embedding_service: Optional[EmbeddingService] = None) -> None:
+    def __init__(self, db: AsyncSession, embedding_service: Optional[EmbeddingService] = None) -> None:
         self.db = db
-        self.embedding_service = embedding_service or EmbeddingService()
-        self.processor = DocumentProcessor(databricks_host=None, token=None)
+        self.embedding_service = embedding_service or get_embedding_service()
+        self.processor = get_document_processor()
 
-    def ingest_upload(self, file_bytes: bytes, filename: str, owner_id: Optional[UUID]) -> models.Document:
-        with tempfile.NamedTemporaryFile(delete=False) as tmp:
-            tmp.write(file_bytes)
-            tmp_path = Path(tmp.name)
-        try:
-            record = self.processor.process_file(str(tmp_path))
-            chunks = self.processor.build_chunks(record)
-        finally:
-            tmp_path.unlink(missing_ok=True)
+    async def ingest_upload_stream(
+        self, source: BinaryIO, filename: str, owner_id: Optional[UUID]
+    ) -> Tuple[models.Document, int]:
+        """Store an uploaded file as a document; returns it with its chunk count."""
+        # spooling to disk, parsing and chunking block; run them off the event loop
+        record, chunks = await run_in_threadpool(self._process_upload, source, filename)
 
-        document = models.Document(title=record.get("file_name") or filename, source="upload", owner_id=owner_id)
+        document = models.Document(title=record["file_name"], source="upload", owner_id=owner_id)
         self.db.add(document)
-        self.db.flush()
-
-        embedding_vectors = self._build_embeddings(chunks)
-        for chunk, embedding in zip(chunks, embedding_vectors, strict=False):
-            chunk_model = models.DocumentChunk(
-                document_id=document.id, content=chunk["content"], metadata=chunk.get("metadata", {}), embedding=embedding
-            )
-            self.db.add(chunk_model)
-        self.db.commit()
-        self.db.refresh(document)
-        return document
-
-    def ingest_text_rows(self, rows: Iterable[Dict[str, str]], source: str, owner_id: Optional[UUID]) -> models.Document:
+        await self.db.flush()
+
+        await self._insert_chunks(document.id, chunks, await self._build_embeddings(chunks))
+        await self.db.commit()
+        _search_cache.clear()
+        return document, len(chunks)
+
+    async def ingest_text_rows(
+        self, rows: Iterable[Dict[str, str]], source: str, owner_id: Optional[UUID]
+    ) -> Tuple[models.Document, int]:
         content = "\n".join([", ".join(f"{k}: {v}" for k, v in row.items()) for row in rows])
-        chunks = self.processor.build_chunks({"content": content, "file_name": source, "format": "text"})
+        chunks = await run_in_threadpool(
+            self.processor.build_chunks, {"content": content, "file_name": source, "format": "text"}
+        )
         document = models.Document(title=source, source="databricks", owner_id=owner_id)
         self.db.add(document)
-        self.db.flush()
-
-        embedding_vectors = self._build_embeddings(chunks)
-        for chunk, embedding in zip(chunks, embedding_vectors, strict=False):
-            chunk_model = models.DocumentChunk(
-                document_id=document.id, content=chunk["content"], metadata=chunk.get("metadata", {}), embedding=embedding
-            )
-            self.db.add(chunk_model)
-        self.db.commit()
-        self.db.refresh(document)
-        return document
-
-    def search(self, query: str, k: int = 4) -> List[Dict]:
-        embed = self.embedding_service.embed(query)
+        await self.db.flush()
+
+        await self._insert_chunks(document.id, chunks, await self._build_embeddings(chunks))
+        await self.db.commit()
+        _search_cache.clear()
+        return document, len(chunks)
+
+    async def search(self, query: str, k: int = 4, use_cache: Optional[bool] = None) -> List[Dict]:
+        embed = await run_in_threadpool(self.embedding_service.embed, query)
+        if use_cache is None:
+            use_cache = settings.semantic_cache_enabled
+        if use_cache:
+            # near-duplicate matching needs model embeddings; fallback hash vectors of unrelated
+            # queries score close together, so without a model only exact repeats hit
+            near = embed if self.embedding_service.client else None
+            cached = _search_cache.get(query, near)
+            if cached is not None and cached[0] >= k:
+                return cached[1][:k]
+            results = await self._search(embed, k)
+            _search_cache.put(query, (k, results), near)
+            return results
+        return await self._search(embed, k)
+
+    async def _search(self, embed: List[float], k: int) -> List[Dict]:
         column_type = models.DocumentChunk.embedding.property.columns[0].type
         uses_vector = hasattr(column_type, "dim")
 
         if not uses_vector:
-            chunks = self.db.execute(select(models.DocumentChunk)).scalars().all()
-            results = []
-            for chunk in chunks:
-                score = self._cosine_similarity(embed, chunk.embedding or [0.0 for _ in embed])
-                results.append({"id": chunk.id, "content": chunk.content, "metadata": chunk.metadata, "score": score})
-            return sorted(results, key=lambda r: r["score"], reverse=True)[:k]
-
-        stmt = select(models.DocumentChunk).order_by(models.DocumentChunk.embedding.op("<->")(embed)).limit(k)
-        records = self.db.execute(stmt).scalars().all()
-        return [{"id": rec.id, "content": rec.content, "metadata": rec.metadata, "score": 1.0} for rec in records]
-
-    def _build_embeddings(self, chunks: List[Dict]) -> List[List[float]]:
-        embeddings = []
-        for chunk in chunks:
-            embeddings.append(self.embedding_service.embed(chunk.get("content", "")))
-        return embeddings
-
-    def _cosine_similarity(self, a: List[float], b: List[float]) -> float:
-        dot = sum(x * y for x, y in zip(a, b))
-        norm_a = sum(x * x for x in a) ** 0.5
-        norm_b = sum(y * y for y in b) ** 0.5
-        if norm_a == 0 or norm_b == 0:
-            return 0.0
-        return dot / (norm_a * norm_b)
+            chunks = (await self.db.scalars(select(models.DocumentChunk))).all()
+            k = min(k, len(chunks))
+            if k <= 0:
+                return []
+            # stored embeddings are unit length (see _build_embeddings), so cosine is a dot product
+            matrix = np.array([chunk.embedding or [0.0] * len(embed) for chunk in chunks], dtype=np.float32)
+            scores = matrix @ unit_rows(np.asarray([embed], dtype=np.float32))[0]
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return [
+                {"id": chunks[i].id, "content": chunks[i].content, "metadata": chunks[i].metadata, "score": float(scores[i])}
+                for i in top
+            ]
+
+        # SET LOCAL does not accept bind parameters; set_config(..., true) is the transaction-scoped equivalent
+        await self.db.execute(
+            text("SELECT set_config('hnsw.ef_search', :ef, true)"), {"ef": str(settings.hnsw_ef_search)}
+        )
+        # <=> is served by the cosine-ops HNSW index and matches the fallback's similarity semantics
+        distance = models.DocumentChunk.embedding.cosine_distance(embed).label("d")
+        stmt = select(models.DocumentChunk, distance).order_by(distance).limit(k)
+        records = (await self.db.execute(stmt)).all()
+        return [
+            {"id": rec.id, "content": rec.content, "metadata": rec.metadata, "score": 1.0 - float(d)}
+            for rec, d in records
+        ]
+
+    def _process_upload(self, source: BinaryIO, filename: str) -> Tuple[Dict, List[Dict]]:
+        # keep the extension so DocumentProcessor can pick the right parser
+        with tempfile.NamedTemporaryFile(delete=False, suffix=Path(filename or "").suffix) as tmp:
+            shutil.copyfileobj(source, tmp, length=UPLOAD_COPY_BUFFER_SIZE)
+            tmp_path = Path(tmp.name)
+        try:
+            record = self.processor.process_file(str(tmp_path))
+            # the processor only saw the temp file; chunks and title carry the name the client uploaded
+            name = filename or tmp_path.name
+            record.update(file_name=name, file_path=name)
+            return record, self.processor.build_chunks(record)
+        finally:
+            tmp_path.unlink(missing_ok=True)
+
+    async def _insert_chunks(self, document_id: UUID, chunks: List[Dict], embedding_vectors: List[List[float]]) -> None:
+        rows = [
+            {
+                "document_id": document_id,
+                "content": chunk["content"],
+                "metadata": chunk.get("metadata", {}),
+                "embedding": embedding,
+            }
+            for chunk, embedding in zip(chunks, embedding_vectors, strict=False)
+        ]
+        if rows:
+            # one executemany (batched into multi-row VALUES by SQLAlchemy) instead of a unit-of-work INSERT per chunk
+            await self.db.execute(insert(models.DocumentChunk), rows)
+
+    async def _build_embeddings(self, chunks: List[Dict]) -> List[List[float]]:
+        vectors = await run_in_threadpool(
+            self.embedding_service.embed_many, [chunk.get("content", "") for chunk in chunks]
+        )
+        if not vectors:
+            return vectors
+        return unit_rows(np.asarray(vectors, dtype=np.float32)).tolist()
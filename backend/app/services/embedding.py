@@ -1,10 +1,17 @@
 import hashlib
-import math
+from functools import lru_cache
 from typing import List, Optional
 
-import importlib
+import numpy as np
 
 from backend.app.core.config import settings
+from src.services.cache import TTLCache, get_embedding_cache, query_key
+from src.services.http import openai_client
+
+# OpenAI caps the number of inputs accepted by a single embeddings request
+EMBEDDING_BATCH_SIZE = 2048
+# BLAKE2b's maximum digest; divides the common 384/768/1536 dims so tiling repeats whole digests
+FALLBACK_DIGEST_SIZE = 64
 
 
 class EmbeddingService:
@@ -12,7 +19,9 @@ class EmbeddingService:
         self.api_key = api_key or settings.openai_api_key
         self.model = model or settings.embedding_model
         self.dim = dim or settings.embedding_dim
-        self.client = self._get_openai_client()
+        self.client = openai_client(self.api_key)
+        self._cache = TTLCache(maxsize=settings.semantic_cache_maxsize) if settings.semantic_cache_enabled else None
+        self._store = get_embedding_cache(settings.embedding_cache_path) if settings.embedding_cache_path else None
 
     def embed(self, text: str) -> List[float]:
         normalized = text.strip()
@@ -20,25 +29,57 @@ class EmbeddingService:
             return [0.0] * self.dim
 
         if self.client:
-            response = self.client.embeddings.create(model=self.model, input=normalized)
-            return response.data[0].embedding
+            key = query_key(normalized)
+            cached = self._cache.get(key) if self._cache is not None else None
+            if cached is not None:
+                return cached
+            vector = self._embed_remote([normalized])[0]
+            if self._cache is not None:
+                self._cache.set(key, vector, settings.semantic_cache_ttl_seconds)
+            return vector
 
-        vector = [0.0 for _ in range(self.dim)]
         tokens = normalized.lower().split(" ")
-        for token in tokens:
-            digest = hashlib.sha256(token.encode("utf-8")).digest()
-            for i in range(self.dim):
-                vector[i] += digest[i % len(digest)] / 255.0
-        norm = math.sqrt(sum(value * value for value in vector))
+        digests = b"".join(
+            hashlib.blake2b(token.encode("utf-8"), digest_size=FALLBACK_DIGEST_SIZE).digest() for token in tokens
+        )
+        # summing the per-token digests and then tiling equals tiling each digest and summing
+        totals = np.frombuffer(digests, dtype=np.uint8).reshape(len(tokens), -1).sum(axis=0, dtype=np.float64) / 255.0
+        vector = np.resize(totals, self.dim)
+        norm = np.linalg.norm(vector)
         if norm == 0.0:
-            return vector
-        return [value / norm for value in vector]
-
-    def _get_openai_client(self):
-        if not self.api_key:
-            return None
-        spec = importlib.util.find_spec("openai")
-        if not spec:
-            return None
-        openai_module = importlib.import_module("openai")
-        return openai_module.OpenAI(api_key=self.api_key)
+            return vector.tolist()
+        return (vector / norm).tolist()
+
+    def embed_many(self, texts: List[str]) -> List[List[float]]:
+        """Embed many texts with one API request per EMBEDDING_BATCH_SIZE inputs."""
+        if not self.client:
+            return [self.embed(text) for text in texts]
+
+        normalized = [text.strip() for text in texts]
+        vectors: List[List[float]] = [[0.0] * self.dim for _ in normalized]
+        pending = [idx for idx, text in enumerate(normalized) if text]
+        for idx, vector in zip(pending, self._embed_remote([normalized[idx] for idx in pending])):
+            vectors[idx] = vector
+        return vectors
+
+    def _embed_remote(self, texts: List[str]) -> List[List[float]]:
+        if self._store is not None:
+            return self._store.get_or_compute(texts, self.model, self._request_embeddings)
+        return self._request_embeddings(texts)
+
+    def _request_embeddings(self, texts: List[str]) -> List[List[float]]:
+        vectors: List[List[float]] = []
+        for start in range(0, len(texts), EMBEDDING_BATCH_SIZE):
+            batch = texts[start : start + EMBEDDING_BATCH_SIZE]
+            response = self.client.embeddings.create(model=self.model, input=batch)
+            ordered: List[List[float]] = [[] for _ in batch]
+            for item in response.data:
+                ordered[item.index] = item.embedding
+            vectors.extend(ordered)
+        return vectors
+
+
+@lru_cache(maxsize=1)
+def get_embedding_service() -> EmbeddingService:
+    """Process-wide default service; it holds no per-request state."""
+    return EmbeddingService()
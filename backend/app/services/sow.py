@@ -1,22 +1,25 @@
 from datetime import datetime
 from textwrap import dedent
-from typing import Dict, List, Optional
+from typing import AsyncIterator, Dict, Iterator, List, Optional
 from uuid import UUID
 
-from sqlalchemy.orm import Session
+from fastapi.concurrency import iterate_in_threadpool, run_in_threadpool
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from backend.app.core.config import settings
 from backend.app.db import models
-from backend.app.services.embedding import EmbeddingService
+from backend.app.services.embedding import EmbeddingService, get_embedding_service
+from src.services.http import openai_client
 
 
 class SowService:
-    def __init__(self, db: Session, embedding_service: Optional[EmbeddingService] = None) -> None:
+    def __init__(self, db: AsyncSession, embedding_service: Optional[EmbeddingService] = None) -> None:
         self.db = db
-        self.embedding_service = embedding_service or EmbeddingService(api_key=settings.openai_api_key)
-        self.client = self.embedding_service._get_openai_client()  # reuse client creation
+        self.embedding_service = embedding_service or get_embedding_service()
+        self.client = openai_client(settings.openai_api_key)
 
-    def generate(
+    async def generate(
         self,
         project_id: str,
         title: Optional[str],
@@ -27,32 +30,77 @@ class SowService:
         owner_id: Optional[UUID] = None,
     ) -> models.SOWDocument:
         prompt = self._build_prompt(project_id, requirements, constraints, context_snippets, tone)
-        if self.client:
-            response = self.client.chat.completions.create(
-                model=settings.openai_model,
-                messages=[
-                    {"role": "system", "content": "You are an expert delivery lead creating structured SOWs."},
-                    {"role": "user", "content": prompt},
-                ],
-                temperature=0.25,
-            )
-            body = response.choices[0].message.content or ""
-        else:
-            body = prompt
+        body = await run_in_threadpool(self._complete, prompt)
+        return await self._save(project_id, title, body, requirements, constraints, owner_id)
+
+    async def stream(
+        self,
+        project_id: str,
+        title: Optional[str],
+        requirements: List[str],
+        constraints: List[str],
+        context_snippets: List[str],
+        tone: str = "professional",
+        owner_id: Optional[UUID] = None,
+    ) -> AsyncIterator[str]:
+        """Yield the SOW text as the model produces it; the document is stored once the stream completes."""
+        prompt = self._build_prompt(project_id, requirements, constraints, context_snippets, tone)
+        parts: List[str] = []
+        async for text in iterate_in_threadpool(self._complete_stream(prompt)):
+            parts.append(text)
+            yield text
+        await self._save(project_id, title, "".join(parts), requirements, constraints, owner_id)
 
-        sow = models.SOWDocument(
-            project_id=project_id,
-            title=title or "Statement of Work",
-            body=body,
-            metadata={"requirements": requirements, "constraints": constraints},
-            owner_id=owner_id,
-            created_at=datetime.utcnow(),
+    async def _save(
+        self,
+        project_id: str,
+        title: Optional[str],
+        body: str,
+        requirements: List[str],
+        constraints: List[str],
+        owner_id: Optional[UUID],
+    ) -> models.SOWDocument:
+        stmt = (
+            insert(models.SOWDocument)
+            .values(
+                project_id=project_id,
+                title=title or "Statement of Work",
+                body=body,
+                metadata={"requirements": requirements, "constraints": constraints},
+                owner_id=owner_id,
+                created_at=datetime.utcnow(),
+            )
+            .returning(models.SOWDocument)
         )
-        self.db.add(sow)
-        self.db.commit()
-        self.db.refresh(sow)
+        sow = (await self.db.execute(stmt)).scalar_one()
+        await self.db.commit()
         return sow
 
+    def _complete(self, prompt: str) -> str:
+        if not self.client:
+            return prompt
+        response = self.client.chat.completions.create(**self._completion_args(prompt))
+        return response.choices[0].message.content or ""
+
+    def _complete_stream(self, prompt: str) -> Iterator[str]:
+        if not self.client:
+            yield prompt
+            return
+        for chunk in self.client.chat.completions.create(**self._completion_args(prompt), stream=True):
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+    def _completion_args(self, prompt: str) -> Dict:
+        return {
+            "model": settings.openai_model,
+            "messages": [
+                {"role": "system", "content": "You are an expert delivery lead creating structured SOWs."},
+                {"role": "user", "content": prompt},
+            ],
+            "temperature": 0.25,
+            "max_tokens": settings.sow_max_tokens,
+        }
+
     def _build_prompt(
         self,
         project_id: str,
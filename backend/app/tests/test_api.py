@@ -1,5 +1,7 @@
+import asyncio
 import os
 import tempfile
+import uuid
 import pathlib
 import sys
 
@@ -19,12 +21,19 @@ from backend.app.core.config import settings
 from backend.app.db.session import Base, engine
 
 
+async def reset_schema(create: bool) -> None:
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        if create:
+            await conn.run_sync(Base.metadata.create_all)
+    await engine.dispose()
+
+
 @pytest.fixture(scope="session", autouse=True)
 def setup_db():
-    Base.metadata.drop_all(bind=engine)
-    Base.metadata.create_all(bind=engine)
+    asyncio.run(reset_schema(create=True))
     yield
-    Base.metadata.drop_all(bind=engine)
+    asyncio.run(reset_schema(create=False))
 
 
 @pytest.fixture()
@@ -59,6 +68,7 @@ def test_auth_and_upload(client: TestClient):
             files = {"file": ("sample.txt", f, "text/plain")}
             res = client.post(f"{settings.api_prefix}/documents/upload", files=files, headers=headers)
     assert res.status_code == 200
+    assert res.json()["chunk_count"] == 1
 
     # search
     search = client.post(
@@ -68,3 +78,64 @@ def test_auth_and_upload(client: TestClient):
     )
     assert search.status_code == 200
     assert len(search.json()) >= 1
+    assert search.json()[0]["metadata"]["file_path"] == "sample.txt"
+
+
+def test_login_is_case_insensitive(client: TestClient):
+    client.post(f"{settings.api_prefix}/auth/register", json={"email": "Mixed.Case@Example.com", "password": "testpass123"})
+    login = client.post(
+        f"{settings.api_prefix}/auth/login",
+        data={"username": "mixed.case@EXAMPLE.com", "password": "testpass123"},
+        headers={"content-type": "application/x-www-form-urlencoded"},
+    )
+    assert login.status_code == 200
+
+
+def test_refresh_drops_cached_user(client: TestClient):
+    from backend.app.api import deps
+
+    client.post(f"{settings.api_prefix}/auth/register", json={"email": "refresh@example.com", "password": "testpass123"})
+    login = client.post(
+        f"{settings.api_prefix}/auth/login",
+        data={"username": "refresh@example.com", "password": "testpass123"},
+        headers={"content-type": "application/x-www-form-urlencoded"},
+    )
+    headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+    user_id = uuid.UUID(client.get(f"{settings.api_prefix}/auth/me", headers=headers).json()["id"])
+    assert deps._user_cache.get(user_id) is not None
+
+    refreshed = client.post(f"{settings.api_prefix}/auth/refresh", params={"token": login.json()["refresh_token"]})
+    assert refreshed.status_code == 200
+    assert deps._user_cache.get(user_id) is None
+
+
+def test_generate_sow(client: TestClient):
+    client.post(f"{settings.api_prefix}/auth/register", json={"email": "sow@example.com", "password": "testpass123"})
+    login = client.post(
+        f"{settings.api_prefix}/auth/login",
+        data={"username": "sow@example.com", "password": "testpass123"},
+        headers={"content-type": "application/x-www-form-urlencoded"},
+    )
+    headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+
+    res = client.post(
+        f"{settings.api_prefix}/sow/generate",
+        json={"project_id": "p-1", "requirements": ["Ingest documents"], "include_retrieval": False},
+        headers=headers,
+    )
+    assert res.status_code == 200
+    assert "p-1" in res.json()["body"]
+
+    recent = client.get(f"{settings.api_prefix}/sow/recent", headers=headers)
+    assert recent.status_code == 200
+    assert res.json()["sow_id"] in [item["sow_id"] for item in recent.json()]
+
+    streamed = client.post(
+        f"{settings.api_prefix}/sow/generate/stream",
+        json={"project_id": "p-2", "requirements": ["Stream output"], "include_retrieval": False},
+        headers=headers,
+    )
+    assert streamed.status_code == 200
+    assert "p-2" in streamed.text
+    recent = client.get(f"{settings.api_prefix}/sow/recent", headers=headers)
+    assert streamed.text in [item["body"] for item in recent.json()]
@@ -0,0 +1,187 @@
+import asyncio
+import os
+import pathlib
+import sys
+from types import SimpleNamespace
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///./test.db")
+os.environ.setdefault("USE_PGVECTOR", "false")
+
+ROOT = pathlib.Path(__file__).resolve().parents[3]
+if str(ROOT) not in sys.path:
+    sys.path.append(str(ROOT))
+
+import pytest
+from sqlalchemy import delete
+
+from backend.app.services import embedding
+from backend.app.services.embedding import EmbeddingService
+
+
+class FakeEmbeddings:
+    def __init__(self):
+        self.calls = []
+
+    def create(self, model, input):  # noqa: A002
+        self.calls.append(list(input))
+        data = [SimpleNamespace(index=idx, embedding=[float(len(text))]) for idx, text in enumerate(input)]
+        return SimpleNamespace(data=data)
+
+
+def test_embed_many_batches_requests(monkeypatch):
+    monkeypatch.setattr(embedding, "EMBEDDING_BATCH_SIZE", 2)
+    service = EmbeddingService(dim=1)
+    service.client = SimpleNamespace(embeddings=FakeEmbeddings())
+
+    vectors = service.embed_many(["a", "  ", "bbb", "cc", "dddd"])
+
+    assert service.client.embeddings.calls == [["a", "bbb"], ["cc", "dddd"]]
+    assert vectors == [[1.0], [0.0], [3.0], [2.0], [4.0]]
+
+
+def test_embedding_cache_only_embeds_unseen_texts(tmp_path):
+    from src.services.cache import EmbeddingCache
+
+    cache = EmbeddingCache(str(tmp_path / "embeddings.sqlite3"))
+    fake = FakeEmbeddings()
+
+    def compute(texts):
+        return [item.embedding for item in fake.create(model="m", input=texts).data]
+
+    first = cache.get_or_compute(["a", "bb", "a"], "m", compute)
+    second = cache.get_or_compute(["bb", "ccc"], "m", compute)
+
+    assert fake.calls == [["a", "bb"], ["ccc"]]
+    assert first == [[1.0], [2.0], [1.0]]
+    assert second == [[2.0], [3.0]]
+
+
+def test_fallback_search_ranks_by_cosine_similarity():
+    from backend.app.db import models
+    from backend.app.db.session import Base, SessionLocal, engine
+    from backend.app.services.documents import DocumentIngestionService
+
+    service = EmbeddingService(dim=3)
+    service.client = None
+    service.embed = lambda text: [1.0, 0.0, 0.0]
+
+    async def run_search():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        async with SessionLocal() as db:
+            await db.execute(delete(models.DocumentChunk))
+            document = models.Document(title="ranking", source="test")
+            db.add(document)
+            await db.flush()
+            for content, vector in [("far", [0.0, 1.0, 0.0]), ("near", [1.0, 0.1, 0.0]), ("empty", None)]:
+                db.add(models.DocumentChunk(document_id=document.id, content=content, embedding=vector))
+            await db.flush()
+            results = await DocumentIngestionService(db, embedding_service=service).search("query", k=2, use_cache=False)
+            await db.rollback()
+        await engine.dispose()
+        return results
+
+    results = asyncio.run(run_search())
+
+    assert [item["content"] for item in results] == ["near", "far"]
+    assert results[0]["score"] > results[1]["score"]
+
+
+def test_search_cache_matches_near_queries_only_with_model_embeddings(monkeypatch):
+    from backend.app.services import documents
+    from backend.app.services.documents import DocumentIngestionService
+
+    service = EmbeddingService(dim=3)
+    service.client = None
+    # every query embeds identically, as colliding fallback hash vectors would
+    service.embed = lambda text: [1.0, 0.0, 0.0]
+    ingestion = DocumentIngestionService(None, embedding_service=service)
+    searched = []
+
+    async def fake_search(embed, k):
+        searched.append(k)
+        return [{"query": len(searched)}]
+
+    monkeypatch.setattr(ingestion, "_search", fake_search)
+    documents._search_cache.clear()
+
+    async def run(queries):
+        return [await ingestion.search(query, k=1, use_cache=True) for query in queries]
+
+    assert asyncio.run(run(["warehouse setup", "refund policy", "warehouse setup"])) == [
+        [{"query": 1}],
+        [{"query": 2}],
+        [{"query": 1}],
+    ]
+    service.client = SimpleNamespace()
+    assert asyncio.run(run(["configure warehouse", "enterprise refunds"])) == [[{"query": 3}], [{"query": 3}]]
+    documents._search_cache.clear()
+
+
+def test_ttl_cache_expires_and_evicts(monkeypatch):
+    from src.services import cache
+
+    now = [100.0]
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now[0])
+    store = cache.TTLCache(maxsize=2)
+    store.set("a", 1, ttl=10)
+    store.set("b", 2, ttl=10)
+    assert store.get("a") == 1
+    store.set("c", 3, ttl=10)
+    assert store.get("b") is None  # least recently used
+    now[0] += 11
+    assert store.get("a") is None
+    assert store.get("c") is None
+
+
+def test_semantic_cache_matches_exact_and_near_queries():
+    from src.services.cache import SemanticCache
+
+    cache = SemanticCache(maxsize=2, threshold=0.95)
+    cache.put("scope of work template", "cached", embedding=[1.0, 0.0, 0.0])
+
+    assert cache.get("  scope of work template ") == "cached"
+    assert cache.get("sow template", embedding=[0.99, 0.05, 0.0]) == "cached"
+    assert cache.get("unrelated", embedding=[0.0, 1.0, 0.0]) is None
+
+    cache.put("second", 2, embedding=[0.0, 1.0, 0.0])
+    cache.put("third", 3, embedding=[0.0, 0.0, 1.0])
+    assert cache.get("scope of work template") is None
+    assert cache.get("near second", embedding=[0.0, 1.0, 0.01]) == 2
+
+    cache.put("expired", 4, ttl=0)
+    assert cache.get("expired") is None
+
+
+def test_fetch_table_sample_rejects_unsafe_identifiers():
+    from backend.app.services.databricks import DatabricksIngestionService
+
+    service = DatabricksIngestionService.__new__(DatabricksIngestionService)
+    with pytest.raises(ValueError):
+        service.fetch_table_sample("main.default.docs; DROP TABLE users")
+    with pytest.raises(ValueError):
+        service.fetch_table_sample("main.default.docs", columns=["id", "name FROM secrets --"])
+
+
+def test_fetch_dbfs_file_streams_lines_across_chunks(monkeypatch):
+    import base64
+
+    from backend.app.services import databricks
+    from backend.app.services.databricks import DatabricksIngestionService
+
+    payload = "first line\r\nsecond ünïcode line\nlast".encode("utf-8")
+
+    def read(path, offset, length):
+        return SimpleNamespace(data=base64.b64encode(payload[offset : offset + length]).decode())
+
+    monkeypatch.setattr(databricks, "DBFS_READ_CHUNK_SIZE", 5)
+    service = DatabricksIngestionService.__new__(DatabricksIngestionService)
+    service.client = SimpleNamespace(dbfs=SimpleNamespace(read=read))
+
+    lines = list(service.fetch_dbfs_file("/tmp/log.txt"))
+
+    assert lines == [
+        {"line": "1", "content": "first line"},
+        {"line": "2", "content": "second ünïcode line"},
+        {"line": "3", "content": "last"},
+    ]
@@ -0,0 +1,245 @@
+import asyncio
+import csv
+import pathlib
+import random
+import re
+import sys
+from types import SimpleNamespace
+
+ROOT = pathlib.Path(__file__).resolve().parents[3]
+if str(ROOT) not in sys.path:
+    sys.path.append(str(ROOT))
+
+import pytest
+
+from src.orchestration.pipeline import WorkflowPipeline
+from src.services import document_service, http, sow_service
+from src.services.document_service import DocumentProcessor
+from src.services.sow_service import SOWGenerator
+from src.services.vector_search_service import LocalVectorIndex, VectorSearchService
+
+
+def reference_chunk_text(text, chunk_size, chunk_overlap):
+    """Word-window chunking as originally written with regex normalisation and re-joined word lists."""
+    sanitized = re.sub(r"\s+", " ", text).strip()
+    if not sanitized:
+        return []
+    words = sanitized.split(" ")
+    chunks = []
+    start = 0
+    while start < len(words):
+        end = min(start + chunk_size, len(words))
+        chunks.append(" ".join(words[start:end]))
+        start = max(end - chunk_overlap, 0)
+        if end == len(words):
+            break
+    return chunks
+
+
+def reference_csv_content(path):
+    with path.open("r", encoding="utf-8", errors="ignore") as handle:
+        rows = [", ".join(row) for row in csv.reader(handle)]
+    return "\n".join(rows), len(rows)
+
+
+def test_chunk_text_matches_word_window_reference():
+    rng = random.Random(7)
+    alphabet = ["alpha", "b", "ünï", "x,y", " ", "  ", "\t", "\n", "\r\n", " ", "　"]
+    for _ in range(300):
+        chunk_size = rng.randint(2, 12)
+        chunk_overlap = rng.randint(0, chunk_size - 1)
+        processor = DocumentProcessor(None, None, chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+        text = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 80)))
+        assert processor.chunk_text(text) == reference_chunk_text(text, chunk_size, chunk_overlap), repr(text)
+
+
+def test_chunk_text_keeps_short_text_as_one_chunk():
+    processor = DocumentProcessor(None, None, chunk_size=4, chunk_overlap=1)
+
+    assert processor.chunk_text("  one\ttwo\n three  ") == ["one two three"]
+    assert processor.chunk_text(" \n\t ") == []
+    assert processor.chunk_text("a b c d e f") == ["a b c d", "d e f"]
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "",
+        "a,b,c",
+        "a,b,c\n1,2,3\n",
+        "a,b\n\n1,2\n",
+        "a,b\r\n1,2\r\n",
+        'name,notes\n"Smith, J","line one\nline two"\n',
+        '"quoted ""inner"" value",plain\n',
+    ],
+)
+def test_process_csv_matches_csv_module(tmp_path, text):
+    path = tmp_path / "sample.csv"
+    path.write_bytes(text.encode("utf-8"))
+
+    record = DocumentProcessor(None, None)._process_csv(path)
+
+    assert (record["content"], record["rows"]) == reference_csv_content(path)
+
+
+def test_save_to_unity_catalog_pages_insert_parameters(monkeypatch):
+    monkeypatch.setattr(document_service, "UC_INSERT_PAGE_SIZE", 2)
+    processor = DocumentProcessor(
+        "https://host", "token", catalog="main", schema="docs", warehouse_id="w", chunk_size=2, chunk_overlap=0
+    )
+    statements = []
+    monkeypatch.setattr(processor, "_execute_sql", lambda sql, params=None: statements.append((sql, params)))
+    chunks = processor.build_chunk_columns({"content": "a b c d e f g h i j", "file_name": "f.txt", "format": "txt"})
+
+    assert processor.save_to_unity_catalog(chunks)
+
+    create, *inserts = statements
+    assert create[0].startswith("CREATE TABLE IF NOT EXISTS main.docs.documents")
+    assert [len(params) // 5 for _, params in inserts] == [2, 2, 1]
+    for sql, params in inserts:
+        # every placeholder is bound, and numbering restarts on each page
+        assert set(re.findall(r":(\w+)", sql)) == set(params)
+    assert inserts[1][1]["chunk_id0"] == 2
+    assert inserts[1][1]["content1"] == "g h"
+    assert inserts[2][1]["metadata0"] == inserts[0][1]["metadata0"]
+
+
+def test_save_sows_pages_insert_parameters(monkeypatch):
+    monkeypatch.setattr(sow_service, "SOW_INSERT_PAGE_SIZE", 2)
+    generator = SOWGenerator(databricks_host="https://host", token="token", warehouse_id="w")
+    statements = []
+    monkeypatch.setattr(generator, "_execute_sql", lambda sql, params=None: statements.append((sql, params)))
+
+    assert generator.save_sows([("p1", "one", None), ("p2", "two", {"k": "v"}), ("p3", "three", None)])
+
+    _, *inserts = statements
+    assert [sorted(params) for _, params in inserts] == [
+        ["metadata0", "metadata1", "project_id0", "project_id1", "sow_text0", "sow_text1"],
+        ["metadata0", "project_id0", "sow_text0"],
+    ]
+    assert inserts[1][1]["project_id0"] == "p3"
+    for sql, params in inserts:
+        assert set(re.findall(r":(\w+)", sql)) == set(params)
+
+
+def test_generate_batch_omits_failed_requests():
+    def output_line(custom_id, status_code, body, error=None):
+        return (
+            f'{{"custom_id": "{custom_id}", "error": {error or "null"}, '
+            f'"response": {{"status_code": {status_code}, "body": {body}}}}}'
+        )
+
+    files = {
+        "out": "\n".join(
+            [
+                output_line("p1", 200, '{"choices": [{"message": {"content": "SOW one"}}]}'),
+                output_line("p2", 500, '{"error": {"message": "server error"}}'),
+                output_line("p3", 200, '{"choices": [{"message": {"content": null}}]}'),
+            ]
+        ),
+        "err": output_line("p4", 400, '{"error": {"message": "context too long"}}'),
+    }
+    batch = SimpleNamespace(id="b1", status="completed", output_file_id="out", error_file_id="err")
+    generator = SOWGenerator()
+    generator.client = SimpleNamespace(
+        files=SimpleNamespace(
+            create=lambda **kwargs: SimpleNamespace(id="in"),
+            content=lambda file_id: SimpleNamespace(text=files[file_id]),
+        ),
+        batches=SimpleNamespace(create=lambda **kwargs: batch),
+    )
+    job = {"project_details": {"title": "x"}, "requirements": ["a"]}
+
+    assert generator.generate_batch({pid: job for pid in ["p1", "p2", "p3", "p4"]}) == {"p1": "SOW one"}
+
+
+def test_local_vector_index_ranks_and_overwrites_by_id():
+    index = LocalVectorIndex()
+    index.add(["a", "b", "c"], [[1.0, 0.0], [0.0, 2.0], [1.0, 1.0]], [{"n": 1}, {"n": 2}, {"n": 3}])
+
+    assert [hit["id"] for hit in index.search([1.0, 0.1], 2)] == ["a", "c"]
+
+    index.add(["a"], [[0.0, -1.0]], [{"n": 4}])
+    hits = index.search([1.0, 0.1], 3)
+    assert len(index) == 3
+    assert [hit["id"] for hit in hits] == ["c", "b", "a"]
+    assert hits[2]["metadata"] == {"n": 4}
+    assert hits[0]["score"] == pytest.approx((1.0 + 0.1) / (2**0.5 * 1.01**0.5))
+
+    assert index.search([1.0, 0.0, 0.0], 2) == []
+    with pytest.raises(ValueError):
+        index.add(["d"], [[1.0, 0.0, 0.0]], [{}])
+
+
+def test_upsert_skips_rows_already_upserted_unchanged(monkeypatch):
+    service = VectorSearchService(None, None, "documents_index", local_embedding_dim=8)
+    embedded = []
+    embed_many = service.embed_many
+    monkeypatch.setattr(service, "embed_many", lambda texts: embedded.append(list(texts)) or embed_many(texts))
+    processor = DocumentProcessor(None, None, chunk_size=2, chunk_overlap=0)
+    record = {"content": "a b c d", "file_name": "f.txt", "format": "txt", "file_path": "/tmp/f.txt"}
+
+    service.upsert(processor.build_chunk_columns(record))
+    service.upsert(processor.build_chunk_columns(record))
+    service.upsert(processor.build_chunk_columns({**record, "content": "a b c e"}))
+    service.upsert(processor.build_chunk_columns({**record, "content": "a b c e", "file_path": "/data/f.txt"}))
+
+    assert embedded == [["a b", "c d"], ["c e"], ["a b", "c e"]]
+    assert len(service._local_index) == 2
+    assert service.similarity_search("c e", k=1)[0]["id"] == "f.txt::1"
+
+
+def test_search_cache_only_reuses_exact_queries_without_model(monkeypatch):
+    service = VectorSearchService("https://host", "token", "documents_index", endpoint_name="vs")
+    service.embed = lambda text: [1.0, 0.0, 0.0]
+    requests_sent = []
+    monkeypatch.setattr(
+        service, "_request", lambda *args, **kwargs: requests_sent.append(args) or {"results": [len(requests_sent)]}
+    )
+
+    assert service.similarity_search("warehouse setup", k=1) == [1]
+    assert service.similarity_search("refund policy", k=1) == [2]
+    assert service.similarity_search("warehouse setup", k=1) == [1]
+    service.client = object()
+    assert service.similarity_search("enterprise refunds", k=1) == [3]
+    assert service.similarity_search("refunds for enterprise", k=1) == [3]
+    assert len(requests_sent) == 3
+
+
+def test_poll_statement_reads_state_from_raw_body_until_terminal(monkeypatch):
+    bodies = iter(
+        [
+            b'{"statement_id": "s1", "status": {"state": "PENDING"}}',
+            b'{"statement_id":"s1","status":{"state" : "RUNNING"}}',
+            b'{"statement_id": "s1", "status": {"state": "FAILED", "error": {"message": "bad column"}}}',
+        ]
+    )
+    calls = []
+    monkeypatch.setattr(http.time, "sleep", lambda delay: None)
+    monkeypatch.setattr(http, "send_request", lambda *args, **kwargs: calls.append(kwargs) or next(bodies))
+
+    with pytest.raises(RuntimeError, match="bad column"):
+        http.poll_statement(http.build_session("token"), "https://host", "s1")
+    assert calls == [{"raw": True}] * 3
+
+
+def test_document_ingestion_closes_async_client_after_failed_upsert(tmp_path):
+    path = tmp_path / "notes.txt"
+    path.write_text("a b c d")
+    service = VectorSearchService("https://host", "token", "documents_index", endpoint_name="vs")
+    pipeline = WorkflowPipeline(DocumentProcessor(None, None), service, SOWGenerator(), max_retries=1)
+
+    async def run():
+        client = service._async_clients.get()
+
+        async def failing_upsert(chunks):
+            raise ValueError("bad payload")
+
+        service.aupsert = failing_upsert
+        with pytest.raises(ValueError):
+            await pipeline.run_document_ingestion([str(path)], persist=False)
+        return client
+
+    client = asyncio.run(run())
+    assert client.is_closed
+    assert service._async_clients._client is None
@@ -0,0 +1,5 @@
+#!/bin/sh
+# Bring the schema to head before serving; the app itself no longer creates tables on startup
+set -e
+alembic -c /app/backend/alembic.ini upgrade head
+exec uvicorn backend.app.main:app --host 0.0.0.0 --port 8000
@@ -4,13 +4,14 @@ Databricks AI Workflow - Main Entry Point
 """
 
 import argparse
+import asyncio
 import sys
 from typing import Optional
 
 from config.settings import settings
 from src.orchestration.pipeline import WorkflowPipeline
 from src.services.document_service import DocumentProcessor
-from src.services.sow_service import SOWGenerator
+from src.services.sow_service import SOW_BATCH_TIMEOUT_SECONDS, SOWGenerator
 from src.services.vector_search_service import VectorSearchService
 
 
@@ -32,6 +33,7 @@ def build_pipeline() -> WorkflowPipeline:
         openai_api_key=settings.OPENAI_API_KEY,
         embedding_model=settings.VECTOR_SEARCH_EMBEDDING_MODEL,
         local_embedding_dim=settings.VECTOR_SEARCH_LOCAL_DIM,
+        embedding_cache_path=settings.EMBEDDING_CACHE_PATH,
     )
 
     sow_service = SOWGenerator(
@@ -48,7 +50,9 @@ def build_pipeline() -> WorkflowPipeline:
     return WorkflowPipeline(document_service, vector_service, sow_service)
 
 
-def run_workflow(workflow_type: str, project_id: Optional[str] = None) -> bool:
+def run_workflow(
+    workflow_type: str, project_id: Optional[str] = None, batch_timeout: float = SOW_BATCH_TIMEOUT_SECONDS
+) -> bool:
     """Run a specific workflow."""
     pipeline = build_pipeline()
 
@@ -66,10 +70,34 @@ def run_workflow(workflow_type: str, project_id: Optional[str] = None) -> bool:
         print(sow[:500] + ("…" if len(sow) > 500 else ""))
         return True
 
+    if workflow_type == "sow-batch":
+        project_ids = [item.strip() for item in (project_id or "demo").split(",") if item.strip()]
+        print(f"Submitting {len(project_ids)} SOWs to the OpenAI Batch API…")
+        requirements = [
+            "Ingest customer documents",
+            "Generate a high-quality scope of work",
+            "Store outputs in Unity Catalog",
+        ]
+        jobs = {
+            pid: {"project_details": {"project_id": pid, "title": "Sample Project"}, "requirements": requirements}
+            for pid in project_ids
+        }
+        try:
+            sows = pipeline.sow_service.generate_batch(jobs, timeout=batch_timeout)
+        except TimeoutError as exc:
+            print(f"{exc}; giving up after {batch_timeout:.0f}s")
+            return False
+        for pid, sow in sows.items():
+            print(f"\n[{pid}] {sow[:200]}" + ("…" if len(sow) > 200 else ""))
+        failed = [pid for pid in project_ids if pid not in sows]
+        if failed:
+            print(f"\nNo SOW generated for: {', '.join(failed)}")
+        return not failed
+
     if workflow_type == "document-ingestion":
         print("Running document ingestion (no files provided by default)…")
-        chunks = pipeline.run_document_ingestion([], persist=False, index=False)
-        print(f"Processed {len(chunks)} chunks")
+        chunks = asyncio.run(pipeline.run_document_ingestion([], persist=False, index=False))
+        print(f"Processed {len(chunks['content'])} chunks")
         return True
 
     if workflow_type == "batch-processing":
@@ -89,16 +117,22 @@ def main() -> None:
     parser.add_argument("command", choices=["run", "deploy", "test", "status"], help="Command to execute")
     parser.add_argument(
         "--workflow",
-        choices=["sow-generation", "batch-processing", "document-ingestion"],
+        choices=["sow-generation", "sow-batch", "batch-processing", "document-ingestion"],
         default="sow-generation",
         help="Workflow type to run",
     )
-    parser.add_argument("--project-id", help="Project ID for the workflow")
+    parser.add_argument("--project-id", help="Project ID for the workflow (comma-separated for sow-batch)")
+    parser.add_argument(
+        "--batch-timeout",
+        type=float,
+        default=SOW_BATCH_TIMEOUT_SECONDS,
+        help="Seconds sow-batch waits for the OpenAI batch to finish",
+    )
 
     args = parser.parse_args()
 
     if args.command == "run":
-        success = run_workflow(args.workflow, args.project_id)
+        success = run_workflow(args.workflow, args.project_id, args.batch_timeout)
         if success:
             print(f"✅ {args.workflow} completed successfully")
         else:
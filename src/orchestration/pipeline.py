@@ -1,18 +1,34 @@
 # Workflow Orchestrator for Databricks AI Workflow
 # Coordinates ingestion, vector indexing, and SOW generation
 
+import asyncio
 import logging
+import random
+import time
 from typing import Any, Dict, Iterable, List, Optional
 
-from src.services.document_service import DocumentProcessor
+from src.services.document_service import ChunkColumns, DocumentProcessor
+from src.services.http import TransientHTTPError
 from src.services.sow_service import SOWGenerator
 from src.services.vector_search_service import VectorSearchService
 
 logger = logging.getLogger(__name__)
 
+# failures worth another attempt; anything else (bad input, failed SQL) is raised immediately
+RETRYABLE_EXCEPTIONS = (TransientHTTPError, ConnectionError)
+RETRY_MIN_DELAY = 1.0
+RETRY_MAX_DELAY = 30.0
+
 
 class WorkflowPipeline:
-    """High-level orchestrator for the Databricks AI Workflow."""
+    """High-level orchestrator for the Databricks AI Workflow.
+
+    Steps are retried up to `max_retries` times, but only for transient failures (network errors,
+    throttling, 5xx responses), sleeping a randomised exponential backoff between attempts.
+    Unity Catalog writes are not retried here: a failed step may already have committed some INSERT
+    pages, or left one running server-side. The services retry each statement submit at the
+    transport level and ride out failed status polls instead.
+    """
 
     def __init__(
         self,
@@ -26,14 +42,23 @@ class WorkflowPipeline:
         self.sow_service = sow_service
         self.max_retries = max_retries
 
-    def run_document_ingestion(self, files: Iterable[str], persist: bool = True, index: bool = True) -> List[Dict[str, Any]]:
+    async def run_document_ingestion(
+        self, files: Iterable[str], persist: bool = True, index: bool = True
+    ) -> ChunkColumns:
         file_list = list(files)
         logger.info("Starting document ingestion for %s files", len(file_list))
-        chunks = self.document_service.ingest_files(file_list)
+        chunks = await self.document_service.ingest_files_async(file_list)
+        # Unity Catalog persistence and vector upsert are independent I/O; overlap them
+        steps = []
         if persist:
-            self._with_retry(lambda: self.document_service.save_to_unity_catalog(chunks))
+            steps.append(asyncio.to_thread(self.document_service.save_to_unity_catalog, chunks))
         if index:
-            self._with_retry(lambda: self.vector_service.upsert(chunks))
+            steps.append(self._awith_retry(lambda: self.vector_service.aupsert(chunks)))
+        try:
+            await asyncio.gather(*steps)
+        finally:
+            # the async client is bound to this event loop, which callers usually end with asyncio.run
+            await self.vector_service.aclose()
         return chunks
 
     def generate_statement_of_work(
@@ -51,22 +76,37 @@ class WorkflowPipeline:
         )
         if persist:
             project_id = str(project_details.get("project_id")) if project_details else "default"
-            self._with_retry(lambda: self.sow_service.save_sow(sow, project_id, metadata=project_details))
+            self.sow_service.save_sow(sow, project_id, metadata=project_details)
         return sow
 
     def find_similar(self, query: str, k: int = 5) -> List[Dict[str, Any]]:
         return self._with_retry(lambda: self.vector_service.similarity_search(query, k))
 
     def _with_retry(self, func):
-        attempts = 0
-        last_error: Optional[Exception] = None
-        while attempts < self.max_retries:
+        if self.max_retries < 1:
+            raise RuntimeError("Operation failed with no attempts executed")
+        for attempt in range(1, self.max_retries + 1):
             try:
                 return func()
-            except Exception as exc:  # noqa: BLE001
-                attempts += 1
-                last_error = exc
-                logger.warning("Attempt %s/%s failed: %s", attempts, self.max_retries, exc)
-        if last_error:
-            raise last_error
-        raise RuntimeError("Operation failed with no attempts executed")
+            except RETRYABLE_EXCEPTIONS as exc:
+                if attempt == self.max_retries:
+                    raise
+                time.sleep(self._retry_delay(attempt, exc))
+
+    async def _awith_retry(self, make_coro):
+        """Async form of _with_retry; `make_coro` builds a fresh coroutine per attempt."""
+        if self.max_retries < 1:
+            raise RuntimeError("Operation failed with no attempts executed")
+        for attempt in range(1, self.max_retries + 1):
+            try:
+                return await make_coro()
+            except RETRYABLE_EXCEPTIONS as exc:
+                if attempt == self.max_retries:
+                    raise
+                await asyncio.sleep(self._retry_delay(attempt, exc))
+
+    def _retry_delay(self, attempt: int, exc: Exception) -> float:
+        # full jitter keeps concurrent callers from retrying in lockstep
+        delay = random.uniform(RETRY_MIN_DELAY, min(RETRY_MAX_DELAY, RETRY_MIN_DELAY * 2**attempt))
+        logger.warning("Attempt %s/%s failed: %s; retrying in %.1fs", attempt, self.max_retries, exc, delay)
+        return delay
@@ -0,0 +1,221 @@
+# In-process and on-disk caches shared by the CLI services and the backend API
+# Kept under src/ so jobs that ship only src/ can import them without the backend package
+
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable, Dict, Hashable, List, Optional, Sequence
+
+import numpy as np
+
+DEFAULT_THRESHOLD = 0.95
+DEFAULT_TTL_SECONDS = 300.0
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after a per-entry TTL (seconds)."""
+
+    def __init__(self, maxsize: int = 1024) -> None:
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: float) -> None:
+        if ttl <= 0 or self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def query_key(text: str) -> bytes:
+    return hashlib.sha256(text.strip().encode("utf-8")).digest()
+
+
+class SemanticCache:
+    """LRU + TTL cache keyed by query text that can also answer near-duplicate queries.
+
+    Lookups first try an exact sha256(text) match. On a miss, when the caller has the query
+    embedding, the entry with the highest cosine similarity is reused if it reaches the threshold.
+    Embeddings live in one preallocated float32 matrix, so a near-match probe is a single
+    matrix-vector product (what a flat inner-product index would do, without the extra dependency).
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 1024,
+        ttl_seconds: float = DEFAULT_TTL_SECONDS,
+        threshold: float = DEFAULT_THRESHOLD,
+    ) -> None:
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self.threshold = threshold
+        self._slots: "OrderedDict[bytes, int]" = OrderedDict()
+        self._values: List[Any] = [None] * maxsize
+        self._expires = np.zeros(maxsize, dtype=np.float64)
+        self._has_vector = np.zeros(maxsize, dtype=bool)
+        self._matrix: Optional[np.ndarray] = None
+        self._free = list(range(maxsize - 1, -1, -1))
+        self._lock = threading.Lock()
+
+    def get(
+        self, text: str, embedding: Optional[Sequence[float]] = None, threshold: Optional[float] = None
+    ) -> Optional[Any]:
+        key = query_key(text)
+        now = time.monotonic()
+        with self._lock:
+            slot = self._slots.get(key)
+            if slot is not None:
+                if self._expires[slot] > now:
+                    self._slots.move_to_end(key)
+                    return self._values[slot]
+                self._release(key)
+            if embedding is None:
+                return None
+            return self._nearest(embedding, threshold if threshold is not None else self.threshold, now)
+
+    def put(
+        self, text: str, value: Any, embedding: Optional[Sequence[float]] = None, ttl: Optional[float] = None
+    ) -> None:
+        ttl = self.ttl_seconds if ttl is None else ttl
+        if ttl <= 0 or self.maxsize <= 0:
+            return
+        key = query_key(text)
+        vector = _unit(embedding) if embedding is not None else None
+        with self._lock:
+            if key in self._slots:
+                self._release(key)
+            if not self._free:
+                self._release(next(iter(self._slots)))
+            slot = self._free.pop()
+            self._slots[key] = slot
+            self._values[slot] = value
+            self._expires[slot] = time.monotonic() + ttl
+            if vector is not None and self._fits(vector):
+                self._matrix[slot] = vector
+                self._has_vector[slot] = True
+
+    def clear(self) -> None:
+        with self._lock:
+            for key in list(self._slots):
+                self._release(key)
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def _nearest(self, embedding: Sequence[float], threshold: float, now: float) -> Optional[Any]:
+        if self._matrix is None or not self._has_vector.any():
+            return None
+        query = _unit(embedding)
+        if query.shape[0] != self._matrix.shape[1]:
+            return None
+        scores = self._matrix @ query
+        scores[~(self._has_vector & (self._expires > now))] = -np.inf
+        slot = int(np.argmax(scores))
+        if scores[slot] < threshold:
+            return None
+        return self._values[slot]
+
+    def _fits(self, vector: np.ndarray) -> bool:
+        if self._matrix is None:
+            self._matrix = np.zeros((self.maxsize, vector.shape[0]), dtype=np.float32)
+        return vector.shape[0] == self._matrix.shape[1]
+
+    def _release(self, key: bytes) -> None:
+        slot = self._slots.pop(key)
+        self._values[slot] = None
+        self._has_vector[slot] = False
+        self._free.append(slot)
+
+
+def _unit(embedding: Sequence[float]) -> np.ndarray:
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+
+class EmbeddingCache:
+    """SQLite-backed `(model, sha256(text)) -> vector` store so re-ingesting content skips the embeddings API.
+
+    Vectors are stored as float16 bytes, which halves disk use and is well inside embedding precision.
+    """
+
+    def __init__(self, path: str) -> None:
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings "
+            "(model TEXT NOT NULL, hash BLOB NOT NULL, vec BLOB NOT NULL, PRIMARY KEY (model, hash))"
+        )
+        self._lock = threading.Lock()
+
+    def get_or_compute(
+        self, texts: List[str], model: str, compute: Callable[[List[str]], List[List[float]]]
+    ) -> List[List[float]]:
+        """Return vectors for `texts`, calling `compute` once with only the texts not cached yet."""
+        hashes = [hashlib.sha256(text.encode("utf-8")).digest() for text in texts]
+        found = self._lookup(model, set(hashes))
+
+        missing: Dict[bytes, str] = {}
+        for digest, text in zip(hashes, texts):
+            if digest not in found:
+                missing.setdefault(digest, text)
+        if missing:
+            computed = compute(list(missing.values()))
+            rows = []
+            for digest, vector in zip(missing, computed):
+                found[digest] = vector
+                rows.append((model, digest, np.asarray(vector, dtype=np.float16).tobytes()))
+            with self._lock:
+                self._conn.executemany("INSERT OR REPLACE INTO embeddings (model, hash, vec) VALUES (?, ?, ?)", rows)
+        return [found[digest] for digest in hashes]
+
+    def _lookup(self, model: str, hashes: set) -> Dict[bytes, List[float]]:
+        found: Dict[bytes, List[float]] = {}
+        pending = list(hashes)
+        # stay under SQLite's default bound-parameter limit
+        for start in range(0, len(pending), 500):
+            batch = pending[start : start + 500]
+            placeholders = ", ".join("?" * len(batch))
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT hash, vec FROM embeddings WHERE model = ? AND hash IN ({placeholders})", [model, *batch]
+                ).fetchall()
+            for digest, blob in rows:
+                found[digest] = np.frombuffer(blob, dtype=np.float16).astype(np.float32).tolist()
+        return found
+
+
+@lru_cache(maxsize=None)
+def get_embedding_cache(path: str) -> EmbeddingCache:
+    return EmbeddingCache(path)
@@ -0,0 +1,274 @@
+# Shared HTTP session and async client factories for the Databricks REST services
+# Keeps TCP/TLS connections alive across statement submits, polls and index calls, and runs
+# SQL statements through the Statement Execution API for every service that writes to Unity Catalog
+
+import asyncio
+import importlib.util
+import logging
+import re
+import time
+from functools import lru_cache
+from typing import Any, Dict, Optional, Tuple
+
+import httpx
+import orjson
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# throttling / transient unavailability worth retrying; Retry-After is honoured when present
+HTTP_RETRY_STATUSES = (429, 503)
+HTTP_MAX_RETRIES = 3
+# HTTP/2 needs the optional h2 package (httpx[http2])
+_http2_available = importlib.util.find_spec("h2") is not None
+# statement polling backs off from 50ms to 1s so short statements return quickly
+POLL_INITIAL_DELAY = 0.05
+POLL_MAX_DELAY = 1.0
+POLL_TIMEOUT_SECONDS = 120
+# submits wait server-side this long before handing back a statement id, so short statements need no polling
+STATEMENT_WAIT_TIMEOUT_SECONDS = 30
+# the submit response is held back for up to the wait timeout, so its read timeout must outlast it
+SUBMIT_TIMEOUT_SECONDS = STATEMENT_WAIT_TIMEOUT_SECONDS + 30
+STATEMENTS_PATH = "/api/2.0/sql/statements"
+STATEMENT_RUNNING_STATES = frozenset({"PENDING", "RUNNING", "QUEUED"})
+# polls only need the state; it is read from the raw body and the full JSON parsed once it is terminal
+_STATE_RE = re.compile(rb'"state"\s*:\s*"(\w+)"')
+_RUNNING_STATE_BYTES = frozenset(state.encode() for state in STATEMENT_RUNNING_STATES)
+
+logger = logging.getLogger(__name__)
+
+
+class TransientHTTPError(RuntimeError):
+    """Network failure, throttling or 5xx response; the same call may succeed later."""
+
+
+def is_transient(exc: Exception) -> bool:
+    """True for failures worth retrying, from either requests or httpx."""
+    if isinstance(exc, (requests.ConnectionError, requests.Timeout, httpx.TransportError)):
+        return True
+    response = getattr(exc, "response", None)
+    return response is not None and (response.status_code >= 500 or response.status_code in HTTP_RETRY_STATUSES)
+
+
+def encode_json(payload: Any) -> bytes:
+    """Request body bytes; numpy arrays and scalars serialise directly from their buffers."""
+    return orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY)
+
+
+def decode_json(body: bytes) -> Any:
+    """Parsed response body, or None when it is not JSON."""
+    try:
+        return orjson.loads(body)
+    except orjson.JSONDecodeError:
+        return None
+
+
+def build_session(
+    token: Optional[str] = None, pool_connections: int = 4, pool_maxsize: int = 20
+) -> requests.Session:
+    """Session with a keep-alive connection pool and retries for throttled or unreachable hosts.
+
+    JSON content type and, when `token` is given, bearer auth are set once as session headers.
+    """
+    retry = Retry(
+        total=HTTP_MAX_RETRIES,
+        # never resend a request whose response may have been lost mid-read (statement submits are not idempotent)
+        read=0,
+        backoff_factor=0.5,
+        status_forcelist=HTTP_RETRY_STATUSES,
+        allowed_methods=None,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=retry)
+    session = requests.Session()
+    session.headers.update(_auth_headers(token))
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def prepare_request(
+    session: requests.Session, method: str, url: str, data: Optional[bytes] = None
+) -> Tuple[requests.PreparedRequest, Dict[str, Any]]:
+    """Request with session headers merged plus the environment send settings (proxies, CA bundle).
+
+    Pass both to `session.send`; a GET built this way can be resent as-is, e.g. on every statement poll.
+    """
+    prepared = session.prepare_request(requests.Request(method, url, data=data))
+    settings = session.merge_environment_settings(prepared.url, {}, None, None, None)
+    return prepared, settings
+
+
+def send_request(
+    session: requests.Session,
+    request: requests.PreparedRequest,
+    settings: Dict[str, Any],
+    timeout: float = 30,
+    raw: bool = False,
+) -> Any:
+    """Send a prepared request; the JSON body, `{}` when empty or `{"raw": text}` when not JSON.
+
+    With `raw=True` the unparsed body bytes are returned instead.
+    """
+    try:
+        response = session.send(request, timeout=timeout, **settings)
+        response.raise_for_status()
+    except requests.RequestException as exc:
+        error = TransientHTTPError if is_transient(exc) else RuntimeError
+        raise error(f"HTTP request failed: {exc}") from exc
+    return response.content if raw else _response_body(response.content)
+
+
+def execute_statement(
+    session: requests.Session,
+    host: str,
+    warehouse_id: str,
+    statement: str,
+    params: Optional[Dict[str, Any]] = None,
+) -> None:
+    """Run a SQL statement on a warehouse and wait for it to finish.
+
+    The submit is sent once (the session never resends after a lost response), so callers must not
+    retry a whole statement either: a TimeoutError means it may still be running server-side.
+    """
+    data = encode_json(_statement_payload(warehouse_id, statement, params))
+    response = send_request(
+        session, *prepare_request(session, "POST", f"{host}{STATEMENTS_PATH}", data), timeout=SUBMIT_TIMEOUT_SECONDS
+    )
+    statement_id = _statement_id(response)
+    if not statement_finished(response):
+        poll_statement(session, host, statement_id)
+
+
+def poll_statement(session: requests.Session, host: str, statement_id: str) -> None:
+    # built once; each poll resends the same GET over the pooled connection
+    request, settings = prepare_request(session, "GET", f"{host}{STATEMENTS_PATH}/{statement_id}")
+    deadline = time.monotonic() + POLL_TIMEOUT_SECONDS
+    delay = POLL_INITIAL_DELAY
+    while True:
+        try:
+            if _poll_finished(send_request(session, request, settings, raw=True)):
+                return
+        except TransientHTTPError as exc:
+            # a status read is safe to repeat; the statement itself keeps running server-side
+            logger.warning("Polling statement %s failed: %s", statement_id, exc)
+        _check_deadline(statement_id, deadline)
+        time.sleep(delay)
+        delay = min(POLL_MAX_DELAY, delay * 2)
+
+
+def statement_finished(result: Dict[str, Any]) -> bool:
+    """False while the statement is queued or running; raises if it failed."""
+    status = result.get("status", {})
+    state = status.get("state")
+    if state in STATEMENT_RUNNING_STATES:
+        return False
+    if state == "FAILED":
+        raise RuntimeError(f"SQL execution failed: {status.get('error', {})}")
+    return True
+
+
+def _statement_payload(warehouse_id: str, statement: str, params: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    payload: Dict[str, Any] = {
+        "statement": statement,
+        "warehouse_id": warehouse_id,
+        "wait_timeout": f"{STATEMENT_WAIT_TIMEOUT_SECONDS}s",
+        "on_wait_timeout": "CONTINUE",
+    }
+    if params:
+        payload["parameters"] = [{"name": key, "value": value} for key, value in params.items()]
+    return payload
+
+
+def _statement_id(response: Dict[str, Any]) -> str:
+    statement_id = response.get("statement_id")
+    if not statement_id:
+        raise RuntimeError("Failed to submit statement to Databricks SQL")
+    return statement_id
+
+
+def _poll_finished(body: bytes) -> bool:
+    match = _STATE_RE.search(body)
+    if match is not None and match.group(1) in _RUNNING_STATE_BYTES:
+        return False
+    return statement_finished(_response_body(body))
+
+
+def _check_deadline(statement_id: str, deadline: float) -> None:
+    if time.monotonic() > deadline:
+        raise TimeoutError(f"SQL statement {statement_id} still running after {POLL_TIMEOUT_SECONDS}s")
+
+
+def _response_body(content: bytes) -> Dict[str, Any]:
+    if not content:
+        return {}
+    parsed = decode_json(content)
+    return parsed if parsed is not None else {"raw": content.decode("utf-8", errors="replace")}
+
+
+@lru_cache(maxsize=1)
+def openai_http_client() -> httpx.Client:
+    """Process-wide transport for the OpenAI clients.
+
+    Concurrent embedding batches and SOW completions go to the same host, so with h2 installed they
+    multiplex over one HTTP/2 connection instead of each holding its own TLS connection.
+    """
+    return httpx.Client(
+        http2=_http2_available, limits=httpx.Limits(max_connections=50, max_keepalive_connections=20)
+    )
+
+
+@lru_cache(maxsize=None)
+def openai_client(api_key: Optional[str]) -> Any:
+    """Process-wide OpenAI client per API key on the shared transport, or None without a key or the package.
+
+    The openai module is imported on first use rather than when the services are imported.
+    """
+    if not api_key:
+        return None
+    if importlib.util.find_spec("openai") is None:
+        logger.warning("openai package not installed; skipping client creation")
+        return None
+    return importlib.import_module("openai").OpenAI(api_key=api_key, http_client=openai_http_client())
+
+
+def _auth_headers(token: Optional[str]) -> dict:
+    headers = {"Content-Type": "application/json"}
+    if token:
+        headers["Authorization"] = f"Bearer {token}"
+    return headers
+
+
+class AsyncClientPool:
+    """Lazily built httpx.AsyncClient for the coroutine APIs, one per running event loop.
+
+    An AsyncClient's connections belong to the loop that opened them, so a new client is built
+    when the services are reused from another `asyncio.run`.
+    """
+
+    def __init__(self, token: Optional[str] = None, timeout: float = 60.0) -> None:
+        self._token = token
+        self._timeout = timeout
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def get(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            # connect failures are retried by the transport; throttling is left to the caller's retry policy
+            transport = httpx.AsyncHTTPTransport(
+                http2=_http2_available,
+                retries=HTTP_MAX_RETRIES,
+                limits=httpx.Limits(max_connections=50, max_keepalive_connections=20),
+            )
+            self._client = httpx.AsyncClient(
+                transport=transport, headers=_auth_headers(self._token), timeout=self._timeout
+            )
+            self._loop = loop
+        return self._client
+
+    async def aclose(self) -> None:
+        if self._client is not None and self._loop is asyncio.get_running_loop():
+            await self._client.aclose()
+        self._client = None
+        self._loop = None
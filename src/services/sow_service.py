@@ -2,18 +2,42 @@
 # Generates Statements of Work using LLMs and templates
 
 import datetime as dt
-import json
 import logging
 import time
 from textwrap import dedent
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
-import urllib.error
-import urllib.request
-import importlib
+import orjson
+
+from src.services.http import build_session, execute_statement, openai_client
 
 logger = logging.getLogger(__name__)
 
+# rows per multi-row INSERT in save_sows; SOW texts are large, so pages stay small
+SOW_INSERT_PAGE_SIZE = 50
+SOW_SYSTEM_PROMPT = "You are an expert project manager crafting SOWs."
+# dedented once at import; only the fields are substituted per call
+SOW_PROMPT_TEMPLATE = dedent(
+    """
+    Create a Statement of Work in a {tone} tone.
+
+    Project Details: {project_details}
+    Requirements:
+    - {scope}
+    Constraints:
+    - {constraints}
+    Context Snippets:
+    {context}
+
+    Include milestones, deliverables, acceptance criteria, and success metrics.
+    Provide a concise executive summary followed by detailed sections.
+    """
+).strip()
+BATCH_ENDPOINT = "/v1/chat/completions"
+BATCH_TERMINAL_STATES = {"completed", "failed", "expired", "cancelled"}
+# batches may take up to the 24h completion window; interactive callers should wait far less
+SOW_BATCH_TIMEOUT_SECONDS = 3600.0
+
 
 class SOWGenerator:
     """Generate Statements of Work based on project inputs and retrieved context."""
@@ -29,7 +53,7 @@ class SOWGenerator:
         table: str = "sow_documents",
         warehouse_id: Optional[str] = None,
     ) -> None:
-        self.client = self._create_openai_client(openai_api_key)
+        self.client = openai_client(openai_api_key)
         self.model = model
         self.databricks_host = databricks_host.rstrip("/") if databricks_host else None
         self.token = token
@@ -37,6 +61,9 @@ class SOWGenerator:
         self.schema = schema
         self.table = table
         self.warehouse_id = warehouse_id
+        self._session = build_session(token)
+        # CREATE TABLE IF NOT EXISTS runs once per generator, not once per save
+        self._table_ensured = False
 
     def generate_sow(
         self,
@@ -49,45 +76,105 @@ class SOWGenerator:
         prompt = self._build_prompt(project_details, requirements, constraints, context_snippets, tone)
 
         if self.client:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": "You are an expert project manager crafting SOWs."},
-                    {"role": "user", "content": prompt},
-                ],
-                temperature=0.2,
-            )
+            response = self.client.chat.completions.create(**self._completion_body(prompt))
             return response.choices[0].message.content or ""
 
         logger.warning("OpenAI not configured; returning templated SOW")
         return prompt
 
+    def generate_batch(
+        self, jobs: Dict[str, Dict[str, Any]], poll_interval: float = 30.0, timeout: Optional[float] = None
+    ) -> Dict[str, str]:
+        """Generate SOWs through the OpenAI Batch API (half price, up to 24h turnaround).
+
+        `jobs` maps a custom id (e.g. the project id) to generate_sow keyword arguments; the result
+        maps the same ids to SOW text. Requests the batch failed are logged and left out of the result.
+        Meant for offline bulk runs, not interactive requests.
+        """
+        if not self.client:
+            return {custom_id: self.generate_sow(**job) for custom_id, job in jobs.items()}
+
+        lines = [
+            orjson.dumps(
+                {
+                    "custom_id": custom_id,
+                    "method": "POST",
+                    "url": BATCH_ENDPOINT,
+                    "body": self._completion_body(self._build_prompt_for(job)),
+                }
+            )
+            for custom_id, job in jobs.items()
+        ]
+        input_file = self.client.files.create(
+            file=("sow_requests.jsonl", b"\n".join(lines)), purpose="batch"
+        )
+        batch = self.client.batches.create(
+            input_file_id=input_file.id, endpoint=BATCH_ENDPOINT, completion_window="24h"
+        )
+        logger.info("Submitted SOW batch %s with %s requests", batch.id, len(lines))
+
+        started = time.monotonic()
+        while batch.status not in BATCH_TERMINAL_STATES:
+            if timeout is not None and time.monotonic() - started > timeout:
+                raise TimeoutError(f"SOW batch {batch.id} still {batch.status}")
+            time.sleep(poll_interval)
+            batch = self.client.batches.retrieve(batch.id)
+        if batch.status != "completed":
+            raise RuntimeError(f"SOW batch {batch.id} ended as {batch.status}")
+
+        results: Dict[str, str] = {}
+        failures: Dict[str, Any] = {}
+        # requests rejected outright land in the error file; failed responses can also appear in the output
+        for record in self._batch_records(batch.error_file_id):
+            failures[record["custom_id"]] = record.get("error") or (record.get("response") or {}).get("body")
+        for record in self._batch_records(batch.output_file_id):
+            response = record.get("response") or {}
+            body = response.get("body") or {}
+            choices = body.get("choices") or [{}]
+            content = choices[0].get("message", {}).get("content")
+            if record.get("error") or response.get("status_code") != 200 or not content:
+                failures[record["custom_id"]] = record.get("error") or body.get("error") or body
+                continue
+            results[record["custom_id"]] = content
+        for custom_id, error in failures.items():
+            logger.warning("SOW batch %s request %s failed: %s", batch.id, custom_id, error)
+        return results
+
+    def _batch_records(self, file_id: Optional[str]) -> Iterator[Dict[str, Any]]:
+        if not file_id:
+            return
+        for line in self.client.files.content(file_id).text.splitlines():
+            if line.strip():
+                yield orjson.loads(line)
+
     def save_sow(self, sow_text: str, project_id: str, metadata: Optional[Dict[str, Any]] = None) -> bool:
         if not (self.databricks_host and self.token and self.warehouse_id):
             logger.warning("Unity Catalog not configured; skipping SOW persistence")
             return False
 
-        metadata = metadata or {}
-        timestamp = dt.datetime.utcnow().isoformat()
-        statement = (
-            f"CREATE TABLE IF NOT EXISTS {self._qualified_table_name()} "
-            "(project_id STRING, created_at TIMESTAMP, sow_text STRING, metadata MAP<STRING, STRING>)"
-        )
-        self._execute_sql(statement)
-
-        insert_sql = (
-            f"INSERT INTO {self._qualified_table_name()} (project_id, created_at, sow_text, metadata) "
-            "VALUES (:project_id, current_timestamp(), :sow_text, from_json(:metadata, 'MAP<STRING, STRING>'))"
-        )
-        params = {
-            "project_id": project_id,
-            "sow_text": sow_text,
-            "metadata": json.dumps({"created_at": timestamp, **metadata}),
-        }
-        self._execute_sql(insert_sql, params=params)
+        if not self._table_ensured:
+            self._execute_sql(self._create_table_sql())
+            self._table_ensured = True
+        self._execute_sql(*self._insert_statement([(project_id, sow_text, metadata)]))
         logger.info("Saved SOW for project %s", project_id)
         return True
 
+    def save_sows(self, sows: List[Tuple[str, str, Optional[Dict[str, Any]]]]) -> bool:
+        """Persist `(project_id, sow_text, metadata)` rows with one multi-row INSERT per page."""
+        if not (self.databricks_host and self.token and self.warehouse_id):
+            logger.warning("Unity Catalog not configured; skipping SOW persistence")
+            return False
+        if not sows:
+            return True
+
+        if not self._table_ensured:
+            self._execute_sql(self._create_table_sql())
+            self._table_ensured = True
+        for start in range(0, len(sows), SOW_INSERT_PAGE_SIZE):
+            self._execute_sql(*self._insert_statement(sows[start : start + SOW_INSERT_PAGE_SIZE]))
+        logger.info("Saved %s SOWs", len(sows))
+        return True
+
     def _qualified_table_name(self) -> str:
         if self.catalog and self.schema:
             return f"{self.catalog}.{self.schema}.{self.table}"
@@ -95,6 +182,53 @@ class SOWGenerator:
             return f"{self.schema}.{self.table}"
         return self.table
 
+    def _create_table_sql(self) -> str:
+        return (
+            f"CREATE TABLE IF NOT EXISTS {self._qualified_table_name()} "
+            "(project_id STRING, created_at TIMESTAMP, sow_text STRING, metadata MAP<STRING, STRING>)"
+        )
+
+    def _insert_statement(
+        self, sows: List[Tuple[str, str, Optional[Dict[str, Any]]]]
+    ) -> Tuple[str, Dict[str, Any]]:
+        timestamp = dt.datetime.utcnow().isoformat()
+        rows = []
+        params: Dict[str, Any] = {}
+        for idx, (project_id, sow_text, metadata) in enumerate(sows):
+            rows.append(
+                f"(:project_id{idx}, current_timestamp(), :sow_text{idx}, "
+                f"from_json(:metadata{idx}, 'MAP<STRING, STRING>'))"
+            )
+            params[f"project_id{idx}"] = project_id
+            params[f"sow_text{idx}"] = sow_text
+            params[f"metadata{idx}"] = orjson.dumps(
+                {"created_at": timestamp, **(metadata or {})}, option=orjson.OPT_NON_STR_KEYS
+            ).decode()
+        insert_sql = (
+            f"INSERT INTO {self._qualified_table_name()} (project_id, created_at, sow_text, metadata) VALUES "
+            + ", ".join(rows)
+        )
+        return insert_sql, params
+
+    def _completion_body(self, prompt: str) -> Dict[str, Any]:
+        return {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": SOW_SYSTEM_PROMPT},
+                {"role": "user", "content": prompt},
+            ],
+            "temperature": 0.2,
+        }
+
+    def _build_prompt_for(self, job: Dict[str, Any]) -> str:
+        return self._build_prompt(
+            job["project_details"],
+            job["requirements"],
+            job.get("constraints"),
+            job.get("context_snippets"),
+            job.get("tone", "professional"),
+        )
+
     def _build_prompt(
         self,
         project_details: Dict[str, Any],
@@ -103,78 +237,18 @@ class SOWGenerator:
         context_snippets: Optional[List[str]],
         tone: str,
     ) -> str:
-        scope = "\n- ".join(requirements)
-        constraint_text = "\n- ".join(constraints or []) or "None provided"
-        context_text = "\n---\n".join(context_snippets or []) or "No context retrieved"
-        return dedent(
-            f"""
-            Create a Statement of Work in a {tone} tone.
-
-            Project Details: {project_details}
-            Requirements:\n- {scope}
-            Constraints:\n- {constraint_text}
-            Context Snippets:\n{context_text}
-
-            Include milestones, deliverables, acceptance criteria, and success metrics.
-            Provide a concise executive summary followed by detailed sections.
-            """
-        ).strip()
+        return SOW_PROMPT_TEMPLATE.format(
+            tone=tone,
+            project_details=project_details,
+            scope="\n- ".join(requirements),
+            constraints="\n- ".join(constraints or []) or "None provided",
+            context="\n---\n".join(context_snippets or []) or "No context retrieved",
+        )
 
     def _execute_sql(self, statement: str, params: Optional[Dict[str, Any]] = None) -> None:
+        self._require_sql_config()
+        execute_statement(self._session, self.databricks_host, self.warehouse_id, statement, params)
+
+    def _require_sql_config(self) -> None:
         if not (self.databricks_host and self.token and self.warehouse_id):
             raise RuntimeError("Databricks SQL configuration is missing")
-
-        url = f"{self.databricks_host}/api/2.0/sql/statements"
-        headers = {
-            "Authorization": f"Bearer {self.token}",
-            "Content-Type": "application/json",
-        }
-        payload: Dict[str, Any] = {"statement": statement, "warehouse_id": self.warehouse_id}
-        if params:
-            payload["parameters"] = [{"name": key, "value": value} for key, value in params.items()]
-
-        response = self._http_request("POST", url, headers, payload)
-        statement_id = response.get("statement_id")
-        if not statement_id:
-            raise RuntimeError("Failed to submit statement to Databricks SQL")
-
-        self._poll_statement(statement_id, headers)
-
-    def _poll_statement(self, statement_id: str, headers: Dict[str, str]) -> None:
-        status_url = f"{self.databricks_host}/api/2.0/sql/statements/{statement_id}"
-        while True:
-            result = self._http_request("GET", status_url, headers)
-            state = result.get("status", {}).get("state")
-            if state in {"PENDING", "RUNNING", "QUEUED"}:
-                time.sleep(1)
-                continue
-            if state == "FAILED":
-                raise RuntimeError(f"SQL execution failed: {result}")
-            return
-
-    def _http_request(
-        self, method: str, url: str, headers: Dict[str, str], payload: Optional[Dict[str, Any]] = None
-    ) -> Dict[str, Any]:
-        data = json.dumps(payload).encode("utf-8") if payload else None
-        req = urllib.request.Request(url, data=data, headers=headers, method=method)
-        try:
-            with urllib.request.urlopen(req, timeout=30) as response:
-                body = response.read().decode()
-        except urllib.error.HTTPError as exc:  # noqa: BLE001
-            raise RuntimeError(f"HTTP request failed: {exc.reason}") from exc
-        if not body:
-            return {}
-        try:
-            return json.loads(body)
-        except json.JSONDecodeError:
-            return {"raw": body}
-
-    def _create_openai_client(self, api_key: Optional[str]):
-        if not api_key:
-            return None
-        spec = importlib.util.find_spec("openai")
-        if not spec:
-            logger.warning("openai package not installed; skipping client creation")
-            return None
-        openai_module = importlib.import_module("openai")
-        return openai_module.OpenAI(api_key=api_key)
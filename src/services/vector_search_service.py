@@ -1,21 +1,55 @@
 # Vector Search Service for Databricks AI Workflow
 # Connects to Databricks Vector Search and performs similarity lookups
 
+import asyncio
 import hashlib
-import json
 import logging
-import math
-from typing import Any, Dict, Iterable, List, Optional
+import re
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
-import urllib.error
-import urllib.request
-import importlib
+import httpx
+import numpy as np
+import requests
+
+from src.services.cache import SemanticCache, TTLCache, get_embedding_cache, query_key
+from src.services.document_service import chunk_rows
+from src.services.http import (
+    AsyncClientPool,
+    TransientHTTPError,
+    build_session,
+    decode_json,
+    encode_json,
+    is_transient,
+    openai_client,
+)
+from src.services.vectors import unit_rows
 
 logger = logging.getLogger(__name__)
 
+# word tokens for the local fallback embedding; punctuation and any run of whitespace separate tokens
+_TOKEN_RE = re.compile(r"\w+")
+# OpenAI limits per embeddings request: number of inputs and total tokens
+EMBEDDING_BATCH_SIZE = 2048
+EMBEDDING_BATCH_TOKENS = 300_000
+# rough chars-per-token ratio for English text; keeps batches under the token cap without a tokenizer
+CHARS_PER_TOKEN = 4
+# embeddings requests in flight at once when a single upsert spans several batches
+EMBEDDING_CONCURRENCY = 4
+# embeddings are deterministic per model, so repeated queries can reuse them for a long time
+QUERY_EMBEDDING_CACHE_SIZE = 4096
+QUERY_EMBEDDING_TTL_SECONDS = 3600.0
+
 
 class VectorSearchService:
-    """Manage vector indexes and similarity search operations."""
+    """Manage vector indexes and similarity search operations.
+
+    Stored and query vectors are L2-normalised before they are sent, so an index using the
+    dot-product metric ranks by cosine similarity without normalising at search time.
+    """
 
     def __init__(
         self,
@@ -26,6 +60,8 @@ class VectorSearchService:
         openai_api_key: Optional[str] = None,
         embedding_model: str = "text-embedding-3-small",
         local_embedding_dim: int = 384,
+        use_cache: bool = True,
+        embedding_cache_path: Optional[str] = None,
     ) -> None:
         self.databricks_host = databricks_host.rstrip("/") if databricks_host else None
         self.token = token
@@ -33,7 +69,16 @@ class VectorSearchService:
         self.endpoint_name = endpoint_name
         self.embedding_model = embedding_model
         self.local_embedding_dim = local_embedding_dim
-        self.client = self._create_openai_client(openai_api_key)
+        self.client = openai_client(openai_api_key)
+        self._search_cache = SemanticCache() if use_cache else None
+        self._query_embeddings = TTLCache(maxsize=QUERY_EMBEDDING_CACHE_SIZE) if use_cache else None
+        self._session = build_session(token)
+        self._async_clients = AsyncClientPool(token)
+        self._embedding_cache = get_embedding_cache(embedding_cache_path) if embedding_cache_path else None
+        # serves upserts and searches while Databricks Vector Search is not configured
+        self._local_index = LocalVectorIndex()
+        # digests of (id, content, metadata) rows already upserted by this service
+        self._upserted_keys: set = set()
 
     def ensure_index(self, dimension: int) -> None:
         """Create the vector search index if it does not exist."""
@@ -50,47 +95,142 @@ class VectorSearchService:
         self._request("POST", "/api/2.0/ai/vector-search/indexes", json_payload=payload)
         logger.info("Ensured vector index %s exists", self.index_name)
 
-    def upsert(self, chunks: Iterable[Dict[str, Any]]) -> None:
-        """Embed and upsert chunks into vector search."""
-        chunk_list = list(chunks)
-        if not chunk_list:
+    def upsert(self, chunks: Dict[str, Any]) -> None:
+        """Embed and upsert chunk columns (as produced by DocumentProcessor.ingest_files) into vector search."""
+        if not len(chunks["content"]):
             logger.info("No chunks provided for upsert")
             return
+        chunks, keys = self._pending_rows(chunks)
+        if not keys:
+            return
 
-        vectors = []
-        for chunk in chunk_list:
-            embedding = self.embed(chunk.get("content", ""))
-            vectors.append(
-                {
-                    "id": f"{chunk.get('file_name')}::{chunk.get('chunk_id')}",
-                    "values": embedding,
-                    "metadata": chunk,
-                }
-            )
+        # the content column goes to the embedder as-is; no per-chunk extraction
+        payload = self._upsert_payload(chunks, self.embed_many(chunks["content"]))
+        if payload is not None:
+            self._request("POST", "/api/2.0/ai/vector-search/indexes/upsert", json_payload=payload)
+            self._upserted(len(payload["vectors"]))
+        self._upserted_keys.update(keys)
 
-        if not (self.databricks_host and self.token and self.endpoint_name):
-            logger.warning("Vector Search not configured; using local mode only")
+    async def aupsert(self, chunks: Dict[str, Any]) -> None:
+        """Coroutine form of upsert; embedding runs in a worker thread and the upsert call is non-blocking."""
+        if not len(chunks["content"]):
+            logger.info("No chunks provided for upsert")
+            return
+        chunks, keys = self._pending_rows(chunks)
+        if not keys:
             return
 
-        payload = {"index_name": self.index_name, "vectors": vectors}
-        self._request("POST", "/api/2.0/ai/vector-search/indexes/upsert", json_payload=payload)
-        logger.info("Upserted %s vectors to %s", len(vectors), self.index_name)
+        embeddings = await asyncio.to_thread(self.embed_many, chunks["content"])
+        payload = self._upsert_payload(chunks, embeddings)
+        if payload is not None:
+            await self._arequest("POST", "/api/2.0/ai/vector-search/indexes/upsert", json_payload=payload)
+            self._upserted(len(payload["vectors"]))
+        self._upserted_keys.update(keys)
 
     def similarity_search(self, query: str, k: int = 5) -> List[Dict[str, Any]]:
         embedding = self.embed(query)
         if not (self.databricks_host and self.token and self.endpoint_name):
-            logger.warning("Vector Search not configured; returning empty results")
-            return []
+            return self._local_index.search(embedding, k)
 
-        payload = {
+        cached = self._cached_results(query, embedding, k)
+        if cached is not None:
+            return cached
+        response = self._request(
+            "POST", "/api/2.0/ai/vector-search/indexes/query", json_payload=self._query_payload(embedding, k)
+        )
+        return self._store_results(query, embedding, k, response)
+
+    async def asimilarity_search(self, query: str, k: int = 5) -> List[Dict[str, Any]]:
+        """Coroutine form of similarity_search."""
+        embedding = await asyncio.to_thread(self.embed, query)
+        if not (self.databricks_host and self.token and self.endpoint_name):
+            return self._local_index.search(embedding, k)
+
+        cached = self._cached_results(query, embedding, k)
+        if cached is not None:
+            return cached
+        response = await self._arequest(
+            "POST", "/api/2.0/ai/vector-search/indexes/query", json_payload=self._query_payload(embedding, k)
+        )
+        return self._store_results(query, embedding, k, response)
+
+    async def aclose(self) -> None:
+        await self._async_clients.aclose()
+
+    def _upsert_payload(self, chunks: Dict[str, Any], embeddings: List[List[float]]) -> Optional[Dict[str, Any]]:
+        # one contiguous float32 matrix instead of per-vector float lists; rows are serialised
+        # straight from the buffer (OPT_SERIALIZE_NUMPY), never converted back to Python floats
+        matrix = unit_rows(np.asarray(embeddings, dtype=np.float32))
+        rows = chunk_rows(chunks)
+        ids = [f"{row['file_name']}::{row['chunk_id']}" for row in rows]
+
+        if not (self.databricks_host and self.token and self.endpoint_name):
+            self._local_index.add(ids, matrix, rows)
+            logger.warning("Vector Search not configured; indexed %s vectors locally", len(ids))
+            return None
+        vectors = [
+            {"id": vector_id, "values": vector, "metadata": row} for vector_id, vector, row in zip(ids, matrix, rows)
+        ]
+        return {"index_name": self.index_name, "vectors": vectors}
+
+    def _pending_rows(self, chunks: Dict[str, Any]) -> Tuple[Dict[str, Any], List[bytes]]:
+        """Chunk columns minus rows this service already upserted unchanged, with the kept rows' keys.
+
+        Re-ingesting a file then only embeds and sends the chunks that changed. Identical content under
+        different ids is kept, so every file stays attributable; embed_many embeds it once.
+        """
+        metadata_json: Dict[int, bytes] = {}
+        keys = []
+        for file_name, chunk_id, content, metadata in zip(
+            chunks["file_name"], chunks["chunk_id"].tolist(), chunks["content"], chunks["metadata"]
+        ):
+            if id(metadata) not in metadata_json:
+                metadata_json[id(metadata)] = encode_json(metadata)
+            digest = hashlib.blake2b(digest_size=16)
+            digest.update(f"{file_name}::{chunk_id}\0{content}\0".encode("utf-8"))
+            digest.update(metadata_json[id(metadata)])
+            keys.append(digest.digest())
+
+        keep = [row for row, key in enumerate(keys) if key not in self._upserted_keys]
+        if len(keep) == len(keys):
+            return chunks, keys
+        logger.info("Skipping %s chunks already upserted unchanged", len(keys) - len(keep))
+        selected = {
+            column: values[keep] if isinstance(values, np.ndarray) else [values[row] for row in keep]
+            for column, values in chunks.items()
+        }
+        return selected, [keys[row] for row in keep]
+
+    def _upserted(self, count: int) -> None:
+        if self._search_cache is not None:
+            self._search_cache.clear()
+        logger.info("Upserted %s vectors to %s", count, self.index_name)
+
+    def _query_payload(self, embedding: List[float], k: int) -> Dict[str, Any]:
+        return {
             "index_name": self.index_name,
-            "query_vector": embedding,
+            "query_vector": unit_rows(np.asarray([embedding], dtype=np.float32))[0],
             "k": k,
         }
-        response = self._request(
-            "POST", "/api/2.0/ai/vector-search/indexes/query", json_payload=payload
-        )
-        return response.get("results", []) if isinstance(response, dict) else []
+
+    def _cached_results(self, query: str, embedding: List[float], k: int) -> Optional[List[Dict[str, Any]]]:
+        if self._search_cache is None:
+            return None
+        cached = self._search_cache.get(query, self._near_match_key(embedding))
+        if cached is not None and cached[0] >= k:
+            return cached[1][:k]
+        return None
+
+    def _store_results(self, query: str, embedding: List[float], k: int, response: Any) -> List[Dict[str, Any]]:
+        results = response.get("results", []) if isinstance(response, dict) else []
+        if self._search_cache is not None:
+            self._search_cache.put(query, (k, results), self._near_match_key(embedding))
+        return results
+
+    def _near_match_key(self, embedding: List[float]) -> Optional[List[float]]:
+        # fallback hash embeddings of unrelated queries score close together; without a model only
+        # exact repeats of a query may reuse results
+        return embedding if self.client else None
 
     def embed(self, text: str) -> List[float]:
         sanitized = text.strip()
@@ -98,20 +238,95 @@ class VectorSearchService:
             return [0.0] * self.local_embedding_dim
 
         if self.client:
-            response = self.client.embeddings.create(model=self.embedding_model, input=sanitized)
-            return response.data[0].embedding
+            key = query_key(sanitized)
+            cached = self._query_embeddings.get(key) if self._query_embeddings is not None else None
+            if cached is not None:
+                return cached
+            if self._embedding_cache is not None:
+                [vector] = self._embedding_cache.get_or_compute(
+                    [sanitized], self.embedding_model, self._request_embeddings
+                )
+            else:
+                response = self.client.embeddings.create(model=self.embedding_model, input=sanitized)
+                vector = response.data[0].embedding
+            if self._query_embeddings is not None:
+                self._query_embeddings.set(key, vector, QUERY_EMBEDDING_TTL_SECONDS)
+            return vector
 
         # Local deterministic embedding as a fallback
-        vector = [0.0 for _ in range(self.local_embedding_dim)]
-        tokens = sanitized.lower().split(" ")
-        for token in tokens:
-            digest = hashlib.sha256(token.encode("utf-8")).digest()
-            for i in range(self.local_embedding_dim):
-                vector[i] += digest[i % len(digest)] / 255.0
-        norm = math.sqrt(sum(value * value for value in vector))
+        # repeated tokens are weighted by their count, so each distinct token is looked up once
+        counts = Counter(_TOKEN_RE.findall(sanitized.lower()))
+        if not counts:
+            return [0.0] * self.local_embedding_dim
+        digests = np.frombuffer(b"".join(map(_token_digest, counts)), dtype=np.uint8).reshape(len(counts), -1)
+        weighted = np.fromiter(counts.values(), dtype=np.float64, count=len(counts)) @ digests
+        # each token contributes its digest cycled to the width, so the weighted sum is cycled once
+        vector = np.resize(weighted, self.local_embedding_dim) / 255.0
+        norm = np.linalg.norm(vector)
         if norm == 0.0:
-            return vector
-        return [value / norm for value in vector]
+            return vector.tolist()
+        vector /= norm
+        return vector.tolist()
+
+    def embed_many(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts with as few API requests as the provider limits allow.
+
+        Identical texts (repeated headers, legal boilerplate) are embedded once and the vector is
+        shared by every occurrence.
+        """
+        unique: Dict[str, int] = {}
+        slots = [unique.setdefault(text.strip(), len(unique)) for text in texts]
+        distinct = list(unique)
+        if len(distinct) < len(texts):
+            logger.info("Embedding %s distinct texts for %s chunks", len(distinct), len(texts))
+
+        if not self.client:
+            vectors = [self.embed(text) for text in distinct]
+        else:
+            pending = [idx for idx, text in enumerate(distinct) if text]
+            inputs = [distinct[idx] for idx in pending]
+            if self._embedding_cache is not None:
+                embedded = self._embedding_cache.get_or_compute(inputs, self.embedding_model, self._request_embeddings)
+            else:
+                embedded = self._request_embeddings(inputs)
+            # blank texts get zero vectors of the model's width, keeping every row the same length
+            dim = len(embedded[0]) if embedded else self.local_embedding_dim
+            vectors = [[0.0] * dim for _ in distinct]
+            for idx, vector in zip(pending, embedded):
+                vectors[idx] = vector
+        return [vectors[slot] for slot in slots]
+
+    def _request_embeddings(self, texts: List[str]) -> List[List[float]]:
+        vectors: List[List[float]] = [[] for _ in texts]
+        batches = list(self._embedding_batches(list(range(len(texts))), texts))
+
+        def request(batch: List[int]) -> None:
+            response = self.client.embeddings.create(model=self.embedding_model, input=[texts[idx] for idx in batch])
+            for item in response.data:
+                vectors[batch[item.index]] = item.embedding
+
+        if len(batches) <= 1:
+            for batch in batches:
+                request(batch)
+            return vectors
+        # batches write disjoint slots, so they can be in flight together
+        with ThreadPoolExecutor(max_workers=min(EMBEDDING_CONCURRENCY, len(batches))) as executor:
+            list(executor.map(request, batches))
+        return vectors
+
+    @staticmethod
+    def _embedding_batches(indices: List[int], texts: List[str]) -> Iterator[List[int]]:
+        batch: List[int] = []
+        batch_tokens = 0
+        for idx in indices:
+            tokens = len(texts[idx]) // CHARS_PER_TOKEN + 1
+            if batch and (len(batch) >= EMBEDDING_BATCH_SIZE or batch_tokens + tokens > EMBEDDING_BATCH_TOKENS):
+                yield batch
+                batch, batch_tokens = [], 0
+            batch.append(idx)
+            batch_tokens += tokens
+        if batch:
+            yield batch
 
     def _request(
         self,
@@ -123,30 +338,107 @@ class VectorSearchService:
             raise RuntimeError("Databricks configuration is missing")
 
         url = f"{self.databricks_host}{path}"
-        headers = {
-            "Authorization": f"Bearer {self.token}",
-            "Content-Type": "application/json",
-        }
-        data = json.dumps(json_payload).encode("utf-8") if json_payload else None
-        req = urllib.request.Request(url, data=data, headers=headers, method=method)
+        data = encode_json(json_payload) if json_payload else None
         try:
-            with urllib.request.urlopen(req, timeout=60) as response:
-                body = response.read().decode()
-        except urllib.error.HTTPError as exc:  # noqa: BLE001
-            raise RuntimeError(f"Vector search request failed: {exc.reason}") from exc
-        if not body:
+            response = self._session.request(method, url, data=data, timeout=60)
+            response.raise_for_status()
+        except requests.RequestException as exc:
+            error = TransientHTTPError if is_transient(exc) else RuntimeError
+            raise error(f"Vector search request failed: {exc}") from exc
+        if not response.content:
             return None
-        try:
-            return json.loads(body)
-        except json.JSONDecodeError:
-            return body
+        parsed = decode_json(response.content)
+        return parsed if parsed is not None else response.text
 
-    def _create_openai_client(self, api_key: Optional[str]):
-        if not api_key:
-            return None
-        spec = importlib.util.find_spec("openai")
-        if not spec:
-            logger.warning("openai package not installed; using local embeddings")
+    async def _arequest(
+        self,
+        method: str,
+        path: str,
+        json_payload: Optional[Dict[str, Any]] = None,
+    ) -> Any:
+        if not (self.databricks_host and self.token):
+            raise RuntimeError("Databricks configuration is missing")
+
+        url = f"{self.databricks_host}{path}"
+        data = encode_json(json_payload) if json_payload else None
+        try:
+            response = await self._async_clients.get().request(method, url, content=data)
+            response.raise_for_status()
+        except httpx.HTTPError as exc:
+            error = TransientHTTPError if is_transient(exc) else RuntimeError
+            raise error(f"Vector search request failed: {exc}") from exc
+        if not response.content:
             return None
-        openai_module = importlib.import_module("openai")
-        return openai_module.OpenAI(api_key=api_key)
+        parsed = decode_json(response.content)
+        return parsed if parsed is not None else response.text
+
+
+class LocalVectorIndex:
+    """In-memory exact inner-product index for running without Databricks Vector Search.
+
+    Vectors are L2-normalised into one preallocated float32 matrix, so a query is a single
+    matrix-vector product plus a partial sort, as in a flat inner-product (cosine) index.
+    Upserting an existing id overwrites its row.
+    """
+
+    def __init__(self) -> None:
+        self._matrix: Optional[np.ndarray] = None
+        self._ids: List[str] = []
+        self._metadata: List[Dict[str, Any]] = []
+        self._rows: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def add(self, ids: List[str], vectors: Any, metadata: List[Dict[str, Any]]) -> None:
+        if not ids:
+            return
+        matrix = unit_rows(np.asarray(vectors, dtype=np.float32))
+        with self._lock:
+            if self._matrix is not None and matrix.shape[1] != self._matrix.shape[1]:
+                raise ValueError(f"Expected {self._matrix.shape[1]}-dimensional vectors, got {matrix.shape[1]}")
+            rows = []
+            for vector_id, meta in zip(ids, metadata):
+                row = self._rows.get(vector_id)
+                if row is None:
+                    row = self._rows[vector_id] = len(self._ids)
+                    self._ids.append(vector_id)
+                    self._metadata.append(meta)
+                else:
+                    self._metadata[row] = meta
+                rows.append(row)
+            self._reserve(len(self._ids), matrix.shape[1])
+            self._matrix[rows] = matrix
+
+    def search(self, embedding: List[float], k: int) -> List[Dict[str, Any]]:
+        with self._lock:
+            count = len(self._ids)
+            if not count or k <= 0 or len(embedding) != self._matrix.shape[1]:
+                return []
+            scores = self._matrix[:count] @ unit_rows(np.asarray([embedding], dtype=np.float32))[0]
+            k = min(k, count)
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return [{"id": self._ids[row], "score": float(scores[row]), "metadata": self._metadata[row]} for row in top]
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def _reserve(self, count: int, dim: int) -> None:
+        capacity = 0 if self._matrix is None else self._matrix.shape[0]
+        if count <= capacity:
+            return
+        # grow geometrically so repeated upserts copy the matrix O(log n) times
+        matrix = np.zeros((max(count, 2 * capacity, 1024), dim), dtype=np.float32)
+        if self._matrix is not None:
+            matrix[:capacity] = self._matrix
+        self._matrix = matrix
+
+
+@lru_cache(maxsize=65536)
+def _token_digest(token: str) -> bytes:
+    """A token's 64-byte BLAKE2b digest; the local embedding cycles it to the vector width.
+
+    The digest only needs to be deterministic and well mixed; BLAKE2b (stdlib) is cheaper than
+    SHA-256 and yields 64 bytes per call, so the pattern repeats half as often. Caching the digest
+    rather than the widened pattern keeps a full cache at a few MB whatever the dimension.
+    """
+    return hashlib.blake2b(token.encode("utf-8"), digest_size=64).digest()
@@ -0,0 +1,10 @@
+# Vector helpers shared by the CLI vector search service and the backend API
+
+import numpy as np
+
+
+def unit_rows(matrix: np.ndarray) -> np.ndarray:
+    """L2-normalise each row, leaving all-zero rows (empty chunks) as zeros."""
+    # row-wise dot products in one pass, without the squared temporary linalg.norm builds
+    norms = np.sqrt(np.einsum("ij,ij->i", matrix, matrix))[:, None]
+    return np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)